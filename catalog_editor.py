@@ -3,161 +3,312 @@ import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 import os
 from typing import List, Dict, Optional, Tuple
+import inspect
 import json
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime
 
+from catalog_loader import (CatalogWatcher, DEFAULT_CATEGORY_SETTINGS, discover_categories,
+                            feature_label, load_feature_image)
+from compositing import composite_batch
+from export_queue import EXPORT_PRESETS, ExportQueue, ExportSource, TiledExportSource, format_for_path
+from face_landmarks import (LANDMARKS_VERSION, FaceLandmarkDetector, face_roll, landmarks_from_bytes,
+                            landmarks_to_bytes)
+from history import EditHistory, HistoryEntry
+from image_ingest import file_digest, load_working_image
+from render_cache import RenderCache, array_digest, derived_key, recipe_key
+from session_manager import SessionManager
+from live_tryon import LiveTryOn
+from tiled_image import TiledImage
+
 WORKDIR = Path(__file__).parent
+ASSETS_DIR = WORKDIR / "assets"
+
+# RAM for transformed (scaled/rotated/faded) feature images, shared by all sessions. Transforms bigger
+# than a quarter of it (full-resolution export sizes) aren't cached so they can't flush the working set
+TRANSFORM_CACHE_BYTES = 256 * 1024 * 1024
+
+# Uploads larger than WORKING_MAX_SIDE are decoded at reduced size for editing and re-rendered at
+# full resolution on save; above TILED_THRESHOLD_PIXELS the full image is kept in a memory-mapped tiled file
+TILED_THRESHOLD_PIXELS = 40_000_000
+WORKING_MAX_SIDE = 2048
+
+# Composites and encoded exports keyed by base image hash + overlay recipe
+RENDER_CACHE_DIR = WORKDIR / ".render_cache"
+
+# RAM for each session's undo/redo pixel patches; older history spills to a temp folder beyond it
+HISTORY_MEMORY_CAP = 64 * 1024 * 1024
+
+# RAM shared by all open editing sessions; idle ones beyond it are parked on disk
+SESSION_MEMORY_BUDGET = 2 * 1024 * 1024 * 1024
 
 
 class CatalogEditor:
-    def __init__(self):
+    def __init__(self, shared: Optional['CatalogEditor'] = None, session_id: Optional[str] = None):
+        """
+        One editing session. With shared, the feature catalog, its caches, the render cache and the
+        export queue are reused from that editor instead of being loaded again (one per server).
+        session_id tags this session's export jobs so each browser only sees its own.
+        """
+        self.session_id = session_id
         self.base_image = None
+        self.tiled_base = None  # full-resolution TiledImage when base_image is a downscaled working copy
+        self.source_path = None  # full-resolution upload to re-decode on export when base_image was shrunk
+        self.full_size = None  # upright size of the upload before shrinking
+        self.base_digest = None  # content hash of the uploaded image, for the render cache
         self.overlays = []
+        # base_image with the confirmed overlays, patched incrementally by every undoable edit
+        self._confirmed_image = None
+        self._confirmed_version = 0
+        self.history = EditHistory(HISTORY_MEMORY_CAP)
         self.selected_feature = None
         self.selected_category = "eyes"
         self.current_scale = 0.2
         self.current_rotation = 0
         self.current_opacity = 1.0
-        self.feature_catalog = {}
         self.preview_overlay = None
-        self.init_feature_catalog()
+        self.editing_index = None  # confirmed overlay loaded with load_overlay() - image clicks move it
+        self.live_tryon = LiveTryOn(self)
+        if shared is not None:
+            self._share_catalog(shared)
+            return
 
-    def add_to_catalog(self, category: str, folder: Path):
-        self.feature_catalog[category] = {}
+        self.feature_catalog = {}
+        self.catalog_settings = {}
+        self.catalog_watcher = None
+        # The watcher thread mutates the catalog while request handlers read it
+        self._catalog_lock = threading.RLock()
+        self._thumbnail_cache = {}
+        self._transform_cache = OrderedDict()
+        self._transform_cache_bytes = [0]  # [0] is the RAM held by _transform_cache; shared by all sessions
+        self._catalog_versions = [0]  # [0] is bumped whenever a catalog image changes; shared by all sessions
+        self._asset_digests = {}  # (category, name) -> content hash of the loaded image
+        self.init_feature_catalog()
+        self.export_queue = ExportQueue()
+        self.render_cache = RenderCache(RENDER_CACHE_DIR)
+        self.landmark_detector = FaceLandmarkDetector()
+
+    def _share_catalog(self, shared: 'CatalogEditor'):
+        """Point this session at another editor's catalog state (updated in place by its watcher)"""
+        self.feature_catalog = shared.feature_catalog
+        self.catalog_settings = shared.catalog_settings
+        self.catalog_watcher = shared.catalog_watcher
+        self._catalog_lock = shared._catalog_lock
+        self._thumbnail_cache = shared._thumbnail_cache
+        self._transform_cache = shared._transform_cache
+        self._transform_cache_bytes = shared._transform_cache_bytes
+        self._catalog_versions = shared._catalog_versions
+        self._asset_digests = shared._asset_digests
+        self.export_queue = shared.export_queue
+        self.render_cache = shared.render_cache
+        self.landmark_detector = shared.landmark_detector
+
+    @property
+    def _catalog_version(self) -> int:
+        return self._catalog_versions[0]
+
+    def add_to_catalog(self, category: str, folder: Path, key_threshold: Optional[int] = 650):
+        with self._catalog_lock:
+            self.feature_catalog[category] = {}
         if folder.exists():
             for img_file in folder.glob("*.png"):
-                try:
-                    # Use filename without extension as the label
-                    name = img_file.stem.replace("_", " ").title()
-                    img = Image.open(img_file).convert("RGBA")
-
-                    # remove white background
-                    datas = img.getdata()
-                    new_data = []
-                    for r, g, b, a in datas:
-                        # turn nearly-white pixels into transparent
-                        if r + g + b > 650:
-                            new_data.append((255, 255, 255, 0))  # transparent
-                        else:
-                            new_data.append((r, g, b, a))
-                    img.putdata(new_data)
-
-                    self.feature_catalog[category][name] = img
-                    print(f"✓ Loaded: {name} from {img_file.name}")
-                except Exception as e:
-                    print(f"✗ Failed to load {img_file.name}: {e}")
-
-    def init_feature_catalog(self):
-        """Initialize catalog - loads both synthetic and real images"""
-
-        # EYES - Real Images (your images)
-        self.feature_catalog['eyes'] = {}
-
-        # Try to load real eye images from assets folder
-        eyes_folder = WORKDIR / "assets" / "eye_images"
-        if eyes_folder.exists():
-            for img_file in eyes_folder.glob("*.png"):
-                try:
-                    img = Image.open(img_file).convert("RGBA")
-                    # Use filename without extension as the label
-                    name = img_file.stem.replace("_", " ").title()
-                    self.feature_catalog['eyes'][name] = img
-                    print(f"✓ Loaded: {name} from {img_file.name}")
-                except Exception as e:
-                    print(f"✗ Failed to load {img_file.name}: {e}")
-
-        mustahce_folder = WORKDIR / "assets" / "mustache_images"
-        self.add_to_catalog('mustache', mustahce_folder)
-
-        eyeglasses_folder = WORKDIR / "assets" / "eyeglasses"
-        self.add_to_catalog('eyeglasses', eyeglasses_folder)
-
-        left_eyebrow_folder = WORKDIR / "assets" / "left_eyebrow"
-        self.add_to_catalog('left_eyebrow', left_eyebrow_folder)
-
-        right_eyebrow_folder = WORKDIR / "assets" / "right_eyebrow"
-        self.add_to_catalog('right_eyebrow', right_eyebrow_folder)
-
-        lips_folder = WORKDIR / "assets" / "lips"
-        self.add_to_catalog('lips', lips_folder)
-
-        nose_folder = WORKDIR / "assets" / "nose_images"
-        self.add_to_catalog('nose', nose_folder)
-
-        left_dimple_folder = WORKDIR / "assets" / "left_dimples"
-        self.add_to_catalog('left_dimples', left_dimple_folder)
+                self.load_catalog_file(category, img_file, key_threshold)
 
-        right_dimple_folder = WORKDIR / "assets" / "right_dimples"
-        self.add_to_catalog('right_dimples', right_dimple_folder)
-
-        ring_folder = WORKDIR / "assets" / "ring"
-        self.add_to_catalog('ring', ring_folder)
-
-        left_eyelashes = WORKDIR / "assets" / "left_eyelashes"
-        self.add_to_catalog('left_eyelashes', left_eyelashes)
-
-        right_eyelashes = WORKDIR / "assets" / "right_eyelashes"
-        self.add_to_catalog('right_eyelashes', right_eyelashes)
-
-        beard = WORKDIR / "assets" / "beard"
-        self.add_to_catalog('beard', beard)
-
-        left_ear = WORKDIR / "assets" / "left_ear"
-        self.add_to_catalog("left_ear", left_ear)
+    def load_catalog_file(self, category: str, img_file: Path, key_threshold: Optional[int] = 650):
+        """Load (or reload) a single PNG into the catalog and drop any cached renders of it"""
+        try:
+            name = feature_label(img_file)
+            img = load_feature_image(img_file, key_threshold)
+            with self._catalog_lock:
+                self.feature_catalog.setdefault(category, {})[name] = img
+                self.invalidate_feature(category, name)
+                self._asset_digests[(category, name)] = array_digest(np.asarray(img))
+            print(f"✓ Loaded: {name} from {img_file.name}")
+        except Exception as e:
+            print(f"✗ Failed to load {img_file.name}: {e}")
+
+    def remove_catalog_file(self, category: str, img_file: Path):
+        """Remove a deleted PNG from the catalog"""
+        name = feature_label(img_file)
+        with self._catalog_lock:
+            if self.feature_catalog.get(category, {}).pop(name, None) is not None:
+                self.invalidate_feature(category, name)
+                print(f"✓ Removed: {name} ({img_file.name} deleted)")
+
+    def set_categories(self, categories: Dict[str, Dict]):
+        """Apply a new category table (manifest edit or new asset folder) without touching loaded images"""
+        with self._catalog_lock:
+            # In place - sessions share this dict
+            self.catalog_settings.clear()
+            self.catalog_settings.update(categories)
+            for category in list(self.feature_catalog):
+                if category not in categories:
+                    for name in list(self.feature_catalog[category]):
+                        self.invalidate_feature(category, name)
+                    del self.feature_catalog[category]
+            for category in categories:
+                self.feature_catalog.setdefault(category, {})
+
+    def invalidate_feature(self, category: str, name: str):
+        """Drop the thumbnail and every cached transform of a catalog item"""
+        with self._catalog_lock:
+            self._catalog_versions[0] += 1
+            self._thumbnail_cache.pop((category, name), None)
+            self._asset_digests.pop((category, name), None)
+            for key in [k for k in self._transform_cache if k[0] == category and k[1] == name]:
+                self._drop_transform(key)
+
+    def _drop_transform(self, key):
+        """Evict one transform cache entry (catalog lock held)"""
+        img = self._transform_cache.pop(key)
+        self._transform_cache_bytes[0] -= img.width * img.height * len(img.getbands())
 
-        right_ear = WORKDIR / "assets" / "right_ear"
-        self.add_to_catalog("right_ear", right_ear)
+    def init_feature_catalog(self):
+        """Initialize catalog from assets/catalog.json plus any other asset subfolders"""
+        self.catalog_settings = discover_categories(ASSETS_DIR)
 
-        haircut = WORKDIR / "assets" / "haircut"
-        self.add_to_catalog("haircut", haircut)
+        for category, settings in self.catalog_settings.items():
+            self.add_to_catalog(category, settings['folder'], settings['key_threshold'])
 
         # If no images found, create a placeholder
-        if not self.feature_catalog['eyes']:
+        if 'eyes' in self.feature_catalog and not self.feature_catalog['eyes']:
             print("⚠ No eye images found in assets/eye_images/")
             placeholder = Image.new('RGBA', (200, 100), (200, 200, 200, 255))
             draw = ImageDraw.Draw(placeholder)
             draw.text((100, 50), "No images\nfound", fill=(100, 100, 100, 255), anchor="mm")
             self.feature_catalog['eyes']['Placeholder'] = placeholder
 
+    def start_catalog_watcher(self, interval: float = 2.0):
+        """Hot-reload added/changed/removed assets into the live catalog"""
+        if self.catalog_watcher is None:
+            self.catalog_watcher = CatalogWatcher(
+                ASSETS_DIR,
+                on_changed=lambda category, img_file: self.load_catalog_file(
+                    category, img_file, self.catalog_settings[category]['key_threshold']),
+                on_removed=self.remove_catalog_file,
+                on_categories_changed=self.set_categories,
+                interval=interval
+            )
+        self.catalog_watcher.start()
+        return self.catalog_watcher
+
+    def category_names(self) -> List[str]:
+        with self._catalog_lock:
+            return list(self.feature_catalog.keys())
+
+    def category_defaults(self, category) -> Tuple[float, float, float]:
+        """Default (scale, rotation, opacity) for a category"""
+        settings = self.catalog_settings.get(category, DEFAULT_CATEGORY_SETTINGS)
+        return settings['default_scale'], settings['default_rotation'], settings['default_opacity']
+
+    def refresh_catalog(self, category):
+        """Refresh the category list and gallery after assets changed on disk"""
+        if self.catalog_watcher is not None:
+            self.catalog_watcher.poll()
+        choices = self.category_names()
+        if category not in choices:
+            category = choices[0] if choices else None
+        return gr.update(choices=choices, value=category), self.create_catalog_gallery(category)
 
     def create_catalog_gallery(self, category):
         """Create a gallery of thumbnails for the selected category"""
         if category not in self.feature_catalog:
             return None
 
-        items = self.feature_catalog[category]
+        with self._catalog_lock:
+            items = list(self.feature_catalog[category].items())
         gallery_items = []
 
-        for name, img in items.items():
-            # Create a thumbnail with white background
-            thumb_size = (150, 150)
-            thumbnail = Image.new('RGBA', thumb_size, (255, 255, 255, 255))
+        for name, img in items:
+            thumbnail = self._thumbnail_cache.get((category, name))
+            if thumbnail is None:
+                thumbnail = self._make_thumbnail(name, img)
+                with self._catalog_lock:
+                    # Don't cache a thumbnail of an image the watcher replaced meanwhile
+                    if self.feature_catalog.get(category, {}).get(name) is img:
+                        self._thumbnail_cache[(category, name)] = thumbnail
 
-            # Paste the feature in the center
-            img_copy = img.copy()
-            img_copy.thumbnail((120, 120), Image.Resampling.LANCZOS)
+            gallery_items.append((thumbnail, name))
 
-            # Center the image
-            x = (thumb_size[0] - img_copy.width) // 2
-            y = (thumb_size[1] - img_copy.height) // 2
-            thumbnail.paste(img_copy, (x, y), img_copy)
+        return gallery_items
 
-            # Add label
-            draw = ImageDraw.Draw(thumbnail)
-            try:
-                font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 12)
-            except:
-                font = ImageFont.load_default()
+    def _make_thumbnail(self, name, img):
+        """Render a labelled thumbnail with white background"""
+        thumb_size = (150, 150)
+        thumbnail = Image.new('RGBA', thumb_size, (255, 255, 255, 255))
 
-            text_bbox = draw.textbbox((0, 0), name, font=font)
-            text_width = text_bbox[2] - text_bbox[0]
-            text_x = (thumb_size[0] - text_width) // 2
-            draw.text((text_x, 5), name, fill=(0, 0, 0, 255), font=font)
+        # Paste the feature in the center
+        img_copy = img.copy()
+        img_copy.thumbnail((120, 120), Image.Resampling.LANCZOS)
 
-            gallery_items.append((thumbnail, name))
+        # Center the image
+        x = (thumb_size[0] - img_copy.width) // 2
+        y = (thumb_size[1] - img_copy.height) // 2
+        thumbnail.paste(img_copy, (x, y), img_copy)
 
-        return gallery_items
+        # Add label
+        draw = ImageDraw.Draw(thumbnail)
+        try:
+            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 12)
+        except:
+            font = ImageFont.load_default()
+
+        text_bbox = draw.textbbox((0, 0), name, font=font)
+        text_width = text_bbox[2] - text_bbox[0]
+        text_x = (thumb_size[0] - text_width) // 2
+        draw.text((text_x, 5), name, fill=(0, 0, 0, 255), font=font)
+
+        return thumbnail
+
+    def transform_feature(self, category, name, scale, rotation, opacity):
+        """
+        Return the catalog item scaled, rotated and faded, or None if it isn't in the catalog.
+
+        Results up to a quarter of TRANSFORM_CACHE_BYTES are cached by (category, name, scale, rotation,
+        opacity) - treat them as read-only.
+        """
+        key = (category, name, scale, rotation, opacity)
+        with self._catalog_lock:
+            cached = self._transform_cache.get(key)
+            if cached is not None:
+                self._transform_cache.move_to_end(key)
+                return cached
+            source = self.feature_catalog.get(category, {}).get(name)
+        if source is None:
+            return None
+
+        feature_img = source.copy()
+
+        # Apply transformations
+        if scale != 1.0:
+            new_size = (int(feature_img.width * scale),
+                        int(feature_img.height * scale))
+            feature_img = feature_img.resize(new_size, Image.Resampling.LANCZOS)
+
+        if rotation != 0:
+            feature_img = feature_img.rotate(rotation, expand=True,
+                                             resample=Image.Resampling.BICUBIC)
+
+        if opacity != 1.0:
+            feature_array = np.array(feature_img)
+            if feature_array.shape[2] == 4:  # Has alpha channel
+                feature_array[:, :, 3] = (feature_array[:, :, 3] * opacity).astype(np.uint8)
+                feature_img = Image.fromarray(feature_array)
+
+        nbytes = feature_img.width * feature_img.height * len(feature_img.getbands())
+        if nbytes > TRANSFORM_CACHE_BYTES // 4:
+            return feature_img
+        with self._catalog_lock:
+            # Skip caching if the watcher swapped the source image (or another thread cached it) meanwhile
+            if self.feature_catalog.get(category, {}).get(name) is source and key not in self._transform_cache:
+                self._transform_cache[key] = feature_img
+                self._transform_cache_bytes[0] += nbytes
+                while self._transform_cache_bytes[0] > TRANSFORM_CACHE_BYTES:
+                    self._drop_transform(next(iter(self._transform_cache)))
+
+        return feature_img
 
     def get_feature_preview(self):
         """Generate a preview of the currently selected feature with current settings"""
@@ -175,27 +326,13 @@ class CatalogEditor:
 
         category, feature_name = self.selected_feature
 
-        # Get the original image from catalog
-        if category not in self.feature_catalog or feature_name not in self.feature_catalog[category]:
+        # Get the transformed image from catalog
+        feature_img = self.transform_feature(category, feature_name, self.current_scale,
+                                             self.current_rotation, self.current_opacity)
+        if feature_img is None:
+            self.selected_feature = None
             return self.get_feature_preview()  # Return placeholder if not found
-
-        feature_img = self.feature_catalog[category][feature_name].copy()
-
-        # Apply current transformations
-        if self.current_scale != 1.0:
-            new_size = (int(feature_img.width * self.current_scale),
-                        int(feature_img.height * self.current_scale))
-            feature_img = feature_img.resize(new_size, Image.Resampling.LANCZOS)
-
-        if self.current_rotation != 0:
-            feature_img = feature_img.rotate(self.current_rotation, expand=True,
-                                             resample=Image.Resampling.BICUBIC)
-
-        if self.current_opacity != 1.0:
-            feature_array = np.array(feature_img)
-            if feature_array.shape[2] == 4:  # Has alpha channel
-                feature_array[:, :, 3] = (feature_array[:, :, 3] * self.current_opacity).astype(np.uint8)
-                feature_img = Image.fromarray(feature_array)
+        feature_img = feature_img.copy()
 
         # Create a canvas that fits the feature with padding
         # Make canvas size adaptive to always show the entire feature
@@ -247,6 +384,9 @@ class CatalogEditor:
     def change_category(self, category):
         """Handle category change - update gallery and auto-select first item"""
         gallery = self.create_catalog_gallery(category)
+        scale, rotation, opacity = self.category_defaults(category)
+
+        self.editing_index = None
 
         # Auto-select the first item from the new category
         if category in self.feature_catalog and self.feature_catalog[category]:
@@ -254,9 +394,9 @@ class CatalogEditor:
             self.selected_feature = (category, first_item_name)
 
             # Reset sliders to default
-            self.current_scale = 0.2
-            self.current_rotation = 0
-            self.current_opacity = 1.0
+            self.current_scale = scale
+            self.current_rotation = rotation
+            self.current_opacity = opacity
 
             # Get the preview for the first item
             preview_img = self.get_feature_preview()
@@ -266,7 +406,7 @@ class CatalogEditor:
             preview_img = self.get_feature_preview()  # Will show placeholder
 
         # Return: image_display, gallery, preview, scale, rotation, opacity
-        return gr.update(), gallery, preview_img, 0.2, 0, 1.0
+        return gr.update(), gallery, preview_img, scale, rotation, opacity
 
     def select_from_catalog(self, evt: gr.SelectData, category):
         """Handle selection from the catalog gallery with auto-confirm"""
@@ -278,7 +418,7 @@ class CatalogEditor:
 
         if self.preview_overlay is not None:
             # Automatically confirm the current preview
-            self.overlays.append(self.preview_overlay)
+            self._commit('add', len(self.overlays), None, dict(self.preview_overlay))
             old_feature_name = self.preview_overlay['name']
             self.preview_overlay = None
             status_msg = f"✅ Auto-confirmed {old_feature_name}!\n"
@@ -287,11 +427,13 @@ class CatalogEditor:
 
         # Now select the new feature
         self.selected_feature = (category, selected_name)
+        self.editing_index = None
 
         # Reset sliders to default when selecting new feature
-        self.current_scale = 0.2
-        self.current_rotation = 0
-        self.current_opacity = 1.0
+        scale, rotation, opacity = self.category_defaults(category)
+        self.current_scale = scale
+        self.current_rotation = rotation
+        self.current_opacity = opacity
 
         preview_img = self.get_feature_preview()
         status_msg += f"✓ Selected: {selected_name} from {category}\n💡 Adjust size/rotation/opacity below and watch the preview update!"
@@ -300,22 +442,49 @@ class CatalogEditor:
             image_update,  # Only update if we auto-confirmed, otherwise skip
             status_msg,
             preview_img,
-            0.2,  # Reset scale slider
-            0,  # Reset rotation slider
-            1.0  # Reset opacity slider
+            scale,  # Reset scale slider
+            rotation,  # Reset rotation slider
+            opacity  # Reset opacity slider
         )
 
-    def handle_image_upload(self, img):
-        """Handle image upload separately from clicks"""
-        if img is None:
+    def handle_image_upload(self, img_path):
+        """Handle image upload separately from clicks (image_display is set to type="filepath")"""
+        if img_path is None:
             return None, "❌ No image provided"
 
-        # store as PIL and return numpy (image_display is set to type="numpy")
-        self.base_image = Image.fromarray(img).convert('RGBA')
+        # Not closed explicitly: queued exports may still read it, its file goes once they're done
+        self.tiled_base = None
+        self.source_path = None
+
+        status = "✓ Image loaded! Now select a feature from the catalog and click on the image to place it."
+        try:
+            with Image.open(img_path) as probe:
+                pixels = probe.width * probe.height
+            if pixels > TILED_THRESHOLD_PIXELS:
+                # Very large scan: keep the full image on disk in tiles, edit a preview built from them
+                self.tiled_base = TiledImage.from_file(img_path)
+                self.base_image = self.tiled_base.preview(WORKING_MAX_SIDE)
+                self.full_size = self.tiled_base.size
+            else:
+                # Anything bigger than WORKING_MAX_SIDE is shrunk while decoding
+                self.base_image, self.full_size = load_working_image(img_path, WORKING_MAX_SIDE)
+            self.base_digest = file_digest(img_path)
+        except Exception as e:
+            self.base_image = None
+            return None, f"❌ Could not read image: {e}"
+
+        full_size = self.full_size
+        if self.base_image.size != full_size:
+            if self.tiled_base is None:
+                # Re-decoded at full size on export
+                self.source_path = Path(img_path)
+            status += (f"\n📐 Large image ({full_size[0]}×{full_size[1]}px) - editing a "
+                       f"{self.base_image.width}×{self.base_image.height}px working copy, saving at full size.")
         self.overlays = []
         self.preview_overlay = None
-        return np.array(
-            self.base_image), "✓ Image loaded! Now select a feature from the catalog and click on the image to place it."
+        self.editing_index = None
+        self._reset_history()
+        return self.base_image, status
 
     def handle_image_click(self, img, evt: gr.SelectData):
         """Place or move the selected feature where the user clicked"""
@@ -324,17 +493,33 @@ class CatalogEditor:
 
         # Ensure base image is set
         if self.base_image is None:
-            self.base_image = Image.fromarray(img).convert('RGBA')
+            self.handle_image_upload(img)
+            if self.base_image is None:
+                return None, "❌ Please upload an image first"
+
+        # Get click coordinates - evt.index contains (x, y) pixel coordinates
+        click_x = evt.index[0]
+        click_y = evt.index[1]
+
+        if self.editing_index is not None and self.preview_overlay is None:
+            # Move the loaded confirmed feature, keeping its size/rotation/opacity
+            before = self.overlays[self.editing_index]
+            after = dict(before, x=click_x, y=click_y)
+            self._commit('edit', self.editing_index, dict(before), after)
+            return (np.array(self.composite_image()),
+                    f"📍 Moved #{self.editing_index + 1} {after['name']} to ({click_x}, {click_y}). "
+                    f"Click again to move it, or select a catalog feature to place new ones.")
 
         if self.selected_feature is None:
             return np.array(self.composite_image()), "❌ Please select a feature from the catalog first"
 
         category, feature_name = self.selected_feature
-        feature_img = self.feature_catalog[category][feature_name].copy()
-
-        # Get click coordinates - evt.index contains (x, y) pixel coordinates
-        click_x = evt.index[0]
-        click_y = evt.index[1]
+        with self._catalog_lock:
+            available = feature_name in self.feature_catalog.get(category, {})
+        if not available:
+            # The watcher removed it since it was selected
+            self.selected_feature = None
+            return np.array(self.composite_image()), "❌ Please select a feature from the catalog first"
 
         # If we have a preview overlay, we're moving it
         if self.preview_overlay is not None:
@@ -364,7 +549,7 @@ class CatalogEditor:
         if self.preview_overlay is None:
             return np.array(self.composite_image()) if self.base_image else None, "❌ No feature to confirm"
 
-        self.overlays.append(self.preview_overlay)
+        self._commit('add', len(self.overlays), None, dict(self.preview_overlay))
         feature_name = self.preview_overlay['name']
         self.preview_overlay = None
         result = self.composite_image()
@@ -384,11 +569,8 @@ class CatalogEditor:
         if self.base_image is None:
             return None
 
-        result = self.base_image.copy()
-
-        # First composite all confirmed overlays
-        for overlay in self.overlays:
-            result = self._apply_overlay(result, overlay)
+        # Confirmed overlays are already composited - only the preview is drawn per call
+        result = self._confirmed().copy()
 
         # Then add the preview overlay if it exists
         if self.preview_overlay is not None:
@@ -396,35 +578,144 @@ class CatalogEditor:
 
         return result
 
-    def _apply_overlay(self, base_img, overlay):
-        """Apply a single overlay to an image"""
-        category = overlay['category']
-        name = overlay['name']
-
-        if category not in self.feature_catalog or name not in self.feature_catalog[category]:
-            return base_img
-
-        feature_img = self.feature_catalog[category][name].copy()
+    def _confirmed(self):
+        """The base image with all confirmed overlays, rebuilt only if a catalog image changed"""
+        if self._confirmed_image is None or self._confirmed_version != self._catalog_version:
+            self._confirmed_version = self._catalog_version
+            self._confirmed_image = self.base_image.copy()
+            for overlay in self.overlays:
+                self._apply_overlay(self._confirmed_image, overlay)
+        return self._confirmed_image
+
+    def _reset_history(self):
+        """Start a fresh history for a new base image"""
+        self.history.clear()
+        self._confirmed_image = None
+
+    def _overlay_box(self, overlay):
+        """Bounding box (x0, y0, x1, y1) of an overlay clipped to the base image, or None"""
+        if overlay is None:
+            return None
+        feature_img = self.transform_feature(overlay['category'], overlay['name'], overlay['scale'],
+                                             overlay['rotation'], overlay['opacity'])
+        if feature_img is None:
+            return None
+        x = overlay['x'] - feature_img.width // 2
+        y = overlay['y'] - feature_img.height // 2
+        box = (max(x, 0), max(y, 0),
+               min(x + feature_img.width, self.base_image.width), min(y + feature_img.height, self.base_image.height))
+        return box if box[0] < box[2] and box[1] < box[3] else None
+
+    @staticmethod
+    def _union_box(a, b):
+        if a is None or b is None:
+            return a or b
+        return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+    def _render_region(self, box):
+        """Re-render one region of the confirmed composite from the base image"""
+        region = self.base_image.crop(box)
+        for overlay in self.overlays:
+            self._apply_overlay(region, overlay, offset=box[:2])
+        return region
+
+    def _commit(self, op, index, before, after):
+        """
+        Change the overlay list and record it as an undoable delta.
+
+        op is 'add'/'edit'/'remove' (before/after are the overlay at index) or 'clear' (whole lists).
+        Only the dirty region is re-rendered, and its before/after pixels are kept for undo/redo.
+        """
+        confirmed = self._confirmed()
+        if op == 'clear':
+            box = (0, 0, self.base_image.width, self.base_image.height) if before else None
+        else:
+            box = self._union_box(self._overlay_box(before), self._overlay_box(after))
+        before_patch = np.array(confirmed.crop(box)) if box else None
 
-        # Apply transformations
-        if overlay['scale'] != 1.0:
-            new_size = (int(feature_img.width * overlay['scale']),
-                        int(feature_img.height * overlay['scale']))
-            feature_img = feature_img.resize(new_size, Image.Resampling.LANCZOS)
+        self._set_overlays(op, index, before, after, undo=False)
 
-        if overlay['rotation'] != 0:
-            feature_img = feature_img.rotate(overlay['rotation'], expand=True,
-                                             resample=Image.Resampling.BICUBIC)
+        after_patch = None
+        if box:
+            if op == 'add' and index == len(self.overlays) - 1:
+                # A new top overlay only needs pasting over what's already there
+                region = confirmed.crop(box)
+                self._apply_overlay(region, after, offset=box[:2])
+            else:
+                region = self._render_region(box)
+            confirmed.paste(region, box[:2])
+            after_patch = np.array(region)
+
+        self.history.push(HistoryEntry(op, index, before, after, box, before_patch, after_patch,
+                                       self._catalog_version))
+
+    def _set_overlays(self, op, index, before, after, undo):
+        """Apply (or revert, when undo is True) the overlay list change of one history entry"""
+        if op == 'clear':
+            self.overlays = [dict(o) for o in (before if undo else after)]
+        elif op == 'edit':
+            self.overlays[index] = dict(before if undo else after)
+        elif (op == 'add') != undo:
+            # Redoing an add or undoing a remove: the overlay reappears at index
+            self.overlays.insert(index, dict(after if op == 'add' else before))
+        else:
+            del self.overlays[index]
+
+    def _replay(self, entry, undo):
+        """Undo or redo one history entry by pasting its stored patch"""
+        confirmed = self._confirmed()
+        self._set_overlays(entry.op, entry.index, entry.before, entry.after, undo)
+        if entry.catalog_version != self._catalog_version:
+            # A catalog image changed since this edit - the stored pixels are stale, and so is the box
+            # (the reloaded image may be a different size), so rebuild the composite on next use
+            self._confirmed_image = None
+            return
+        if entry.box is None:
+            return
+        before_patch, after_patch = entry.patches()
+        confirmed.paste(Image.fromarray(before_patch if undo else after_patch, 'RGBA'), entry.box[:2])
+
+    def recipe_key(self, overlays=None):
+        """Render cache key for the current base image and an overlay list (default: confirmed overlays)"""
+        if overlays is None:
+            overlays = self.overlays
+        with self._catalog_lock:
+            return recipe_key(self.base_digest, overlays, self._asset_digests)
+
+    def render_recipe(self, key, load_base, overlays, ratio=1.0):
+        """
+        Composite overlays onto a fresh RGBA base from load_base(), served from the render cache when
+        this recipe was seen before. ratio maps working-copy coordinates onto the loaded base.
+        """
+        cached = self.render_cache.get_array(key)
+        if cached is not None:
+            return Image.fromarray(cached, 'RGBA')
+
+        result = load_base()
+        for overlay in overlays:
+            if ratio != 1.0:
+                overlay = dict(overlay, x=int(round(overlay['x'] * ratio)), y=int(round(overlay['y'] * ratio)),
+                               scale=overlay['scale'] * ratio)
+            self._apply_overlay(result, overlay)
+        self.render_cache.put_array(key, np.asarray(result))
+        return result
 
-        if overlay['opacity'] != 1.0:
-            feature_array = np.array(feature_img)
-            if feature_array.shape[2] == 4:  # Has alpha channel
-                feature_array[:, :, 3] = (feature_array[:, :, 3] * overlay['opacity']).astype(np.uint8)
-                feature_img = Image.fromarray(feature_array)
+    def composite_batch(self, images, overlays=None, chunk_size=None):
+        """Apply an overlay recipe (default: the confirmed overlays) to an (N, H, W, 4) uint8 image stack"""
+        if overlays is None:
+            overlays = self.overlays
+        return composite_batch(self, images, overlays, chunk_size=chunk_size)
+
+    def _apply_overlay(self, base_img, overlay, offset=(0, 0)):
+        """Apply a single overlay to an image (whose top-left corner sits at offset in base coordinates)"""
+        feature_img = self.transform_feature(overlay['category'], overlay['name'], overlay['scale'],
+                                             overlay['rotation'], overlay['opacity'])
+        if feature_img is None:
+            return base_img
 
         # Calculate position (center the feature at the clicked point)
-        x = overlay['x'] - feature_img.width // 2
-        y = overlay['y'] - feature_img.height // 2
+        x = overlay['x'] - feature_img.width // 2 - offset[0]
+        y = overlay['y'] - feature_img.height // 2 - offset[1]
 
         # Paste the feature
         base_img.paste(feature_img, (x, y), feature_img)
@@ -432,23 +723,92 @@ class CatalogEditor:
         return base_img
 
     def undo_last(self):
-        """Remove the last added overlay or cancel preview"""
+        """Undo the last edit or cancel preview"""
         if self.preview_overlay is not None:
             self.preview_overlay = None
             result = self.composite_image()
             return np.array(result), "↩️ Cancelled preview"
 
-        if not self.overlays:
+        self.editing_index = None
+        entry = self.history.undo()
+        if entry is None:
             return np.array(self.composite_image()) if self.base_image else None, "❌ Nothing to undo"
 
-        self.overlays.pop()
+        self._replay(entry, undo=True)
+        result = self.composite_image()
+        return np.array(result), f"✓ Undid {self._describe(entry)}"
+
+    def redo_last(self):
+        """Redo the last undone edit"""
+        if self.preview_overlay is not None:
+            return np.array(self.composite_image()), "⚠️ Confirm or cancel the preview before redoing"
+
+        self.editing_index = None
+        entry = self.history.redo()
+        if entry is None:
+            return np.array(self.composite_image()) if self.base_image else None, "❌ Nothing to redo"
+
+        self._replay(entry, undo=False)
         result = self.composite_image()
-        return np.array(result), "✓ Undid last action"
+        return np.array(result), f"✓ Redid {self._describe(entry)}"
+
+    @staticmethod
+    def _describe(entry):
+        if entry.op == 'clear':
+            return "clear all"
+        overlay = entry.after if entry.op == 'add' else entry.before
+        return f"{entry.op} {overlay['name']}"
+
+    def load_overlay(self, number):
+        """Load confirmed feature #number into the sliders for editing; image clicks then move it"""
+        index = int(number or 0) - 1
+        if not 0 <= index < len(self.overlays):
+            return (gr.update(), f"❌ No feature #{number} - see Placed Features for the numbers",
+                    gr.update(), gr.update(), gr.update())
+        if self.preview_overlay is not None:
+            return (gr.update(), "⚠️ Confirm or cancel the preview before editing a placed feature",
+                    gr.update(), gr.update(), gr.update())
+
+        overlay = self.overlays[index]
+        self.editing_index = index
+        self.selected_feature = (overlay['category'], overlay['name'])
+        self.current_scale = overlay['scale']
+        self.current_rotation = overlay['rotation']
+        self.current_opacity = overlay['opacity']
+        return (self.get_feature_preview(),
+                f"✏️ Editing #{index + 1} {overlay['name']} - click the image to move it, or adjust the "
+                f"sliders and click Apply",
+                overlay['scale'], overlay['rotation'], overlay['opacity'])
+
+    def edit_overlay(self, number, scale, rotation, opacity):
+        """Apply the slider size/rotation/opacity to confirmed feature #number (see load_overlay), keeping its position"""
+        index = int(number or 0) - 1
+        if not 0 <= index < len(self.overlays):
+            return gr.update(), f"❌ No feature #{number} - see Placed Features for the numbers"
+
+        before = self.overlays[index]
+        after = dict(before, scale=scale, rotation=rotation, opacity=opacity)
+        self._commit('edit', index, dict(before), after)
+        return np.array(self.composite_image()), f"✏️ Updated #{index + 1} {after['name']}"
+
+    def remove_overlay(self, number):
+        """Remove confirmed feature #number, leaving the features placed after it untouched"""
+        index = int(number or 0) - 1
+        if not 0 <= index < len(self.overlays):
+            return gr.update(), f"❌ No feature #{number} - see Placed Features for the numbers"
+
+        before = dict(self.overlays[index])
+        self.editing_index = None
+        self._commit('remove', index, before, None)
+        return np.array(self.composite_image()), f"🗑️ Removed #{index + 1} {before['name']}"
 
     def clear_all(self):
         """Remove all overlays and preview"""
+        if self.base_image is not None and self.overlays:
+            self._commit('clear', 0, [dict(o) for o in self.overlays], [])
         self.overlays = []
         self.preview_overlay = None
+        self.editing_index = None
         if self.base_image:
             return np.array(self.base_image), "✓ Cleared all features"
         return None, "✓ Cleared all features"
@@ -505,13 +865,135 @@ class CatalogEditor:
         else:
             overlay_text += "None\n"
 
+        if self.editing_index is not None:
+            overlay_text += f"\n✏️ Editing #{self.editing_index + 1} (click the image to move it)"
+
         if self.preview_overlay:
             overlay_text += f"\n⏳ Preview: {self.preview_overlay['name']} (click Confirm or click again to move)"
 
         return overlay_text
 
-    def save_image(self, save_path):
-        """Save the final composite image to the specified path"""
+    def detect_faces(self):
+        """Faces and landmarks of the base image, detected once per image content and detector"""
+        if self.base_image is None:
+            return []
+        key = None
+        if self.base_digest is not None:
+            # In the render cache, so it is shared by sessions and survives restarts
+            key = derived_key(self.base_digest, landmarks=LANDMARKS_VERSION,
+                              backend=self.landmark_detector.backend, size=self.base_image.size)
+            cached = self.render_cache.get(key)
+            if cached is not None:
+                return landmarks_from_bytes(cached)
+
+        faces = self.landmark_detector.detect(self.base_image)
+        if key is not None and self.landmark_detector.backend is not None:
+            self.render_cache.put(key, landmarks_to_bytes(faces))
+        return faces
+
+    def auto_overlays(self, items, faces=None):
+        """
+        Overlays that put each (category, name) item on its category's anchor landmark(s) of every face.
+
+        Size comes from the category's face_width (measured on the visible part of the catalog image),
+        or its default_scale when face_width isn't set, and rotation follows the head tilt. Items whose
+        category has no anchor are skipped.
+        """
+        if faces is None:
+            faces = self.detect_faces()
+        overlays = []
+        for face in faces:
+            face_width = face['box'][2]
+            roll = face_roll(face)
+            for category, name in items:
+                settings = self.catalog_settings.get(category, DEFAULT_CATEGORY_SETTINGS)
+                anchors = settings.get('anchor')
+                with self._catalog_lock:
+                    feature_img = self.feature_catalog.get(category, {}).get(name)
+                if not anchors or feature_img is None:
+                    continue
+
+                # Transparent padding around the artwork shouldn't count towards its size or center
+                box = feature_img.getchannel('A').getbbox() or (0, 0, feature_img.width, feature_img.height)
+                if settings.get('face_width'):
+                    scale = round(settings['face_width'] * face_width / (box[2] - box[0]), 3)
+                else:
+                    # Anchored but not sized - keep the category's slider default
+                    scale = settings['default_scale']
+                rotation = round(settings['default_rotation'] + roll, 1)
+                dx = ((box[0] + box[2]) / 2 - feature_img.width / 2) * scale
+                dy = ((box[1] + box[3]) / 2 - feature_img.height / 2) * scale
+                # The image is rotated about its center (counterclockwise, y pointing down)
+                angle = np.radians(rotation)
+                dx, dy = dx * np.cos(angle) + dy * np.sin(angle), -dx * np.sin(angle) + dy * np.cos(angle)
+
+                for anchor in [anchors] if isinstance(anchors, str) else anchors:
+                    ax, ay = face['points'][anchor]
+                    overlays.append({
+                        'category': category,
+                        'name': name,
+                        'x': int(round(ax - dx)),
+                        'y': int(round(ay - dy)),
+                        'scale': scale,
+                        'rotation': rotation,
+                        'opacity': settings['default_opacity']
+                    })
+        return overlays
+
+    def auto_place(self):
+        """Place the selected feature on every detected face, each placement undoable on its own"""
+        if self.base_image is None:
+            return None, "❌ Please upload an image first"
+        if self.preview_overlay is not None:
+            return np.array(self.composite_image()), "⚠️ Confirm or cancel the preview before auto-placing"
+        if self.selected_feature is None:
+            return np.array(self.composite_image()), "❌ Please select a feature from the catalog first"
+        if self.landmark_detector.backend is None:
+            return np.array(self.composite_image()), "❌ Auto-place needs opencv-python installed"
+
+        category, feature_name = self.selected_feature
+        if not self.catalog_settings.get(category, {}).get('anchor'):
+            return np.array(self.composite_image()), f"❌ No face anchor set for '{category}' in assets/catalog.json"
+
+        faces = self.detect_faces()
+        if not faces:
+            return np.array(self.composite_image()), "❌ No face found - place it by clicking instead"
+
+        overlays = self.auto_overlays([self.selected_feature], faces)
+        for overlay in overlays:
+            self._commit('add', len(self.overlays), None, overlay)
+        return (np.array(self.composite_image()),
+                f"✨ Auto-placed {len(overlays)}× {feature_name} on {len(faces)} face(s) - Undo removes them one by one")
+
+    def start_live_tryon(self, target_fps):
+        """Freeze the placed features (including an unconfirmed preview) for the live try-on stream"""
+        overlays = list(self.overlays)
+        if self.preview_overlay is not None:
+            overlays.append(self.preview_overlay)
+        if not overlays:
+            return "❌ Place some features on a photo first - they will be mapped onto the live frames"
+
+        reference_size = self.base_image.size if self.base_image is not None else None
+        self.live_tryon.target_fps = target_fps
+        self.live_tryon.set_overlays(overlays, reference_size)
+        return f"✓ Live try-on ready with {len(overlays)} features at up to {target_fps:.0f} fps - start the webcam!"
+
+    def stream_live_frame(self, frame):
+        """Webcam stream handler - returns (composited frame, status)"""
+        return self.live_tryon.process(frame), self.live_tryon.status()
+
+    def stream_video_file(self, video_path):
+        """Composite a video file frame by frame (stand-in for the webcam)"""
+        if video_path is None:
+            yield None, "❌ No video provided"
+            return
+        if not self.live_tryon.overlays:
+            self.start_live_tryon(self.live_tryon.target_fps)
+        for frame in self.live_tryon.stream_video(video_path):
+            yield frame, self.live_tryon.status()
+
+    def save_image(self, save_path, presets=None):
+        """Queue the final composite (plus any extra preset outputs) for export to the specified path"""
         if self.base_image is None:
             return "❌ No image to save! Please upload an image first."
 
@@ -536,36 +1018,143 @@ class CatalogEditor:
             # Create parent directories if they don't exist
             save_path.parent.mkdir(parents=True, exist_ok=True)
 
-            # Get the composite image
-            final_image = self.composite_image()
-
-            # Determine format based on file extension
-            file_ext = save_path.suffix.lower()
-
-            if file_ext in ['.jpg', '.jpeg']:
-                # Convert RGBA to RGB for JPEG (no transparency support)
-                rgb_image = Image.new('RGB', final_image.size, (255, 255, 255))
-                rgb_image.paste(final_image, mask=final_image.split()[3] if final_image.mode == 'RGBA' else None)
-                rgb_image.save(save_path, 'JPEG', quality=95)
-            elif file_ext == '.png' or file_ext == '':
-                # Save as PNG (supports transparency)
-                if file_ext == '':
-                    save_path = save_path.with_suffix('.png')
-                final_image.save(save_path, 'PNG')
+            if save_path.suffix == '':
+                save_path = save_path.with_suffix('.png')
+
+            # Snapshot the recipe now so edits made while the job runs don't leak into it
+            overlays = [dict(o) for o in self.overlays]
+            cache_key = self.recipe_key(overlays)
+
+            if self.tiled_base is not None:
+                # Overlays were placed on the working copy - map them back to full resolution
+                ratio = self.tiled_base.width / self.base_image.width
+                source = TiledExportSource(self.tiled_base, self, overlays, ratio)
+                cache_key = derived_key(cache_key, full_size=self.tiled_base.size, working_size=self.base_image.size)
+            elif self.source_path is not None:
+                # Working copy was shrunk on upload - decode the original again in the export worker
+                source_path = self.source_path
+                ratio = self.full_size[0] / self.base_image.width
+                # Overlay coordinates are in working-copy pixels, so its size is part of the recipe
+                cache_key = derived_key(cache_key, full_size=self.full_size, working_size=self.base_image.size)
+                source = ExportSource(render=lambda: self.render_recipe(
+                    cache_key, lambda: load_working_image(source_path)[0], overlays, ratio))
             else:
-                # Try to save with the specified format
-                final_image.save(save_path)
-
-            return f"✅ Image saved successfully to:\n{save_path.absolute()}"
+                base_image = self.base_image
+                # Only rendered if some output isn't in the render cache yet
+                source = ExportSource(render=lambda: self.render_recipe(cache_key, base_image.copy,
+                                                                        overlays))
+
+            # Encoding happens on the export workers - the status box updates as files are written
+            job_id = self.export_queue.submit(source, save_path, presets or [], cache=self.render_cache,
+                                              cache_key=cache_key, owner=self.session_id)
+            status = f"⏳ Export job #{job_id} queued:\n{save_path.absolute()}"
+            if self.tiled_base is not None and format_for_path(save_path) != 'PNG':
+                # Only PNG is streamed from the tiles - anything else is encoded from one frame in RAM
+                frame_mb = self.tiled_base.width * self.tiled_base.height * (
+                    3 if format_for_path(save_path) == 'JPEG' else 4) / 2 ** 20
+                status += (f"\n⚠️ Full-size {save_path.suffix} needs ~{frame_mb:.0f} MB of RAM for this "
+                           f"image - save as .png to stream it tile by tile.")
+            return status
 
         except PermissionError:
             return f"❌ Permission denied! Cannot write to:\n{save_path}\nPlease choose a different location or check your permissions."
         except Exception as e:
             return f"❌ Error saving image:\n{str(e)}\n\nPlease check the path and try again."
 
+    def memory_bytes(self) -> int:
+        """RAM held by this session's images, undo patches and live buffers (shared catalog not counted)"""
+        total = self.history.memory_bytes + self.live_tryon.memory_bytes()
+        for img in (self.base_image, self._confirmed_image):
+            if img is not None:
+                total += img.width * img.height * len(img.getbands())
+        return total
+
+    def session_recipe(self) -> Dict:
+        """JSON-serializable editing state - everything but the base image pixels and the history"""
+        return {
+            'overlays': self.overlays,
+            'preview_overlay': self.preview_overlay,
+            'editing_index': self.editing_index,
+            'selected_feature': list(self.selected_feature) if self.selected_feature else None,
+            'selected_category': self.selected_category,
+            'current_scale': self.current_scale,
+            'current_rotation': self.current_rotation,
+            'current_opacity': self.current_opacity,
+            'full_size': list(self.full_size) if self.full_size else None,
+            'base_digest': self.base_digest,
+            'source_path': str(self.source_path) if self.source_path is not None else None,
+            'live_overlays': self.live_tryon.overlays,
+            'live_reference_size': list(self.live_tryon.reference_size) if self.live_tryon.reference_size else None,
+            'live_target_fps': self.live_tryon.target_fps,
+        }
+
+    def restore_session(self, recipe: Dict, base_image=None, tiled_base=None, history=None):
+        """Rebuild a session from session_recipe() output; the composite is re-rendered on first use"""
+        self.overlays = recipe['overlays']
+        self.preview_overlay = recipe['preview_overlay']
+        self.editing_index = recipe['editing_index']
+        self.selected_feature = tuple(recipe['selected_feature']) if recipe['selected_feature'] else None
+        self.selected_category = recipe['selected_category']
+        self.current_scale = recipe['current_scale']
+        self.current_rotation = recipe['current_rotation']
+        self.current_opacity = recipe['current_opacity']
+        self.full_size = tuple(recipe['full_size']) if recipe['full_size'] else None
+        self.base_digest = recipe['base_digest']
+        self.source_path = Path(recipe['source_path']) if recipe['source_path'] else None
+        self.base_image = base_image
+        self.tiled_base = tiled_base
+        self._confirmed_image = None
+        if history is not None:
+            self.history = history
+        # A webcam stream may still be running - keep mapping the same features onto it
+        self.live_tryon.target_fps = recipe['live_target_fps']
+        if recipe['live_overlays']:
+            self.live_tryon.set_overlays(recipe['live_overlays'],
+                                         tuple(recipe['live_reference_size']) if recipe['live_reference_size'] else None)
+
+
+def session_handler(sessions: SessionManager, method_name: str):
+    """
+    Event handler that runs CatalogEditor.method_name on the requesting browser session's editor.
+
+    Gradio injects gr.Request/gr.SelectData positionally by annotation, so the handler advertises the
+    method's parameters (defaults dropped - Gradio passes every input) plus a trailing request.
+    """
+    method = getattr(CatalogEditor, method_name)
+    params = [p.replace(default=inspect.Parameter.empty)
+              for p in list(inspect.signature(method).parameters.values())[1:]]
+    params.append(inspect.Parameter('request', inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=gr.Request))
+
+    if inspect.isgeneratorfunction(method):
+        def handler(*args):
+            # The session stays pinned in memory for as long as the stream runs
+            with sessions.use(args[-1].session_hash) as editor:
+                yield from getattr(editor, method_name)(*args[:-1])
+    else:
+        def handler(*args):
+            with sessions.use(args[-1].session_hash) as editor:
+                return getattr(editor, method_name)(*args[:-1])
+
+    handler.__name__ = method_name
+    handler.__doc__ = method.__doc__
+    handler.__signature__ = inspect.Signature(params)
+    handler.__annotations__ = {p.name: p.annotation for p in params if p.annotation is not inspect.Parameter.empty}
+    return handler
+
 
 def create_interface():
+    # The catalog is loaded once; every browser session gets its own editor sharing it
     editor = CatalogEditor()
+    editor.start_catalog_watcher()
+    sessions = SessionManager(lambda session_id: CatalogEditor(shared=editor, session_id=session_id),
+                              memory_budget=SESSION_MEMORY_BUDGET).start()
+
+    def session(method_name):
+        return session_handler(sessions, method_name)
+
+    def export_status(request: gr.Request):
+        # Polled every second - reads the shared queue directly so it never wakes a parked session
+        return editor.export_queue.status_text(owner=request.session_hash)
 
     with gr.Blocks(title="Feature Catalog Editor", theme=gr.themes.Soft()) as interface:
         gr.Markdown("# 🎨 Feature Catalog Editor - Real Image Support")
@@ -577,7 +1166,8 @@ def create_interface():
             with gr.Column(scale=2):
                 image_display = gr.Image(
                     label="📤 Upload Image & Click to Place Features",
-                    type="numpy",
+                    type="filepath",  # decoded by handle_image_upload, shrunk on decode if large
+                    image_mode=None,  # hand the file over as uploaded - any other mode makes Gradio re-encode it
                     interactive=True,
                     sources=["upload", "clipboard"]
                 )
@@ -586,6 +1176,7 @@ def create_interface():
                     confirm_btn = gr.Button("✅ Confirm Placement", variant="primary", size="sm")
                     cancel_btn = gr.Button("↩️ Cancel Preview", variant="secondary", size="sm")
                     undo_btn = gr.Button("↶ Undo Last", variant="secondary", size="sm")
+                    redo_btn = gr.Button("↷ Redo", variant="secondary", size="sm")
                     clear_btn = gr.Button("🗑️ Clear All", variant="stop", size="sm")
 
                 # Save section
@@ -601,6 +1192,12 @@ def create_interface():
                     )
                     save_btn = gr.Button("💾 Save Image", variant="primary", size="lg", scale=1)
 
+                export_presets = gr.CheckboxGroup(
+                    choices=[(preset['label'], name) for name, preset in EXPORT_PRESETS.items()],
+                    value=[],
+                    label="Also export (written next to the saved file)"
+                )
+
                 save_status = gr.Textbox(
                     label="Save Status",
                     interactive=False,
@@ -608,6 +1205,14 @@ def create_interface():
                     value="Enter a path and click 'Save Image' to save your work"
                 )
 
+                export_status_box = gr.Textbox(
+                    label="Export Jobs",
+                    interactive=False,
+                    lines=4,
+                    value="No exports yet"
+                )
+                export_timer = gr.Timer(1.0)
+
                 gr.Markdown("---")
 
                 status_text = gr.Textbox(
@@ -623,16 +1228,43 @@ def create_interface():
                     lines=4
                 )
 
+                with gr.Row():
+                    feature_number = gr.Number(label="Feature #", value=1, precision=0, minimum=1, scale=1)
+                    load_feature_btn = gr.Button("📥 Load to Edit/Move", size="sm", scale=1)
+                    edit_feature_btn = gr.Button("✏️ Apply Size/Rotation/Opacity", size="sm", scale=2)
+                    remove_feature_btn = gr.Button("🗑️ Remove Feature", variant="stop", size="sm", scale=1)
+
+                with gr.Accordion("🎥 Live Try-On (webcam / video)", open=False):
+                    gr.Markdown("The features placed above are mapped onto every live frame.")
+                    with gr.Row():
+                        live_fps_slider = gr.Slider(
+                            minimum=5,
+                            maximum=30,
+                            value=15,
+                            step=1,
+                            label="Target FPS"
+                        )
+                        live_start_btn = gr.Button("▶️ Use Current Features", variant="primary", size="sm")
+                    with gr.Row():
+                        webcam_input = gr.Image(
+                            label="Webcam",
+                            type="numpy",
+                            sources=["webcam"],
+                            streaming=True
+                        )
+                        live_output = gr.Image(label="Live Try-On", type="numpy", interactive=False)
+                    video_input = gr.Video(label="...or a video file", sources=["upload"])
+                    live_status = gr.Textbox(label="Live Status", interactive=False, lines=1)
+
             # Right column - Controls
             with gr.Column(scale=1):
                 gr.Markdown("### 1. Select Category")
                 category_select = gr.Radio(
-                    choices=["eyes", "mustache", "eyeglasses", "left_eyebrow", 'right_eyebrow', 'lips',
-                             'nose', 'left_dimples', 'right_dimples', 'ring', 'left_eyelashes', 'right_eyelashes',
-                             'beard', 'left_ear', 'right_ear', 'haircut'],  # Add more as needed
-                    value="eyes",
+                    choices=editor.category_names(),  # From assets/catalog.json + asset subfolders
+                    value=editor.selected_category,
                     label="Feature Category"
                 )
+                refresh_catalog_btn = gr.Button("🔄 Refresh Catalog", variant="secondary", size="sm")
 
                 gr.Markdown("### 2. Choose Style from Catalog")
                 catalog_gallery = gr.Gallery(
@@ -680,19 +1312,20 @@ def create_interface():
 
                 gr.Markdown("### 4. Click on Image to Place")
                 gr.Markdown("💡 **Tip:** Adjust size first, then click where you want it!")
+                auto_place_btn = gr.Button("✨ Auto-Place on Face", variant="secondary")
 
         # Event handlers
 
         # Handle image upload (separate from clicks)
         image_display.upload(
-            fn=editor.handle_image_upload,
+            fn=session('handle_image_upload'),
             inputs=[image_display],
             outputs=[image_display, status_text]
         )
 
         # Update catalog when category changes - updates gallery and auto-selects first item
         category_select.change(
-            fn=editor.change_category,
+            fn=session('change_category'),
             inputs=[category_select],
             outputs=[image_display, catalog_gallery, feature_preview, scale_slider, rotation_slider, opacity_slider]
         )
@@ -704,72 +1337,137 @@ def create_interface():
             outputs=[catalog_gallery]
         )
 
+        # Pick up categories/assets added on disk since the page loaded
+        refresh_catalog_btn.click(
+            fn=editor.refresh_catalog,
+            inputs=[category_select],
+            outputs=[category_select, catalog_gallery]
+        )
+
         # Select from catalog - now with auto-confirm and optimized image updates
         catalog_gallery.select(
-            fn=editor.select_from_catalog,
+            fn=session('select_from_catalog'),
             inputs=[category_select],
             outputs=[image_display, status_text, feature_preview, scale_slider, rotation_slider, opacity_slider]
         )
 
         # Click on image to place/move feature
         image_display.select(
-            fn=editor.handle_image_click,
+            fn=session('handle_image_click'),
             inputs=[image_display],
             outputs=[image_display, status_text]
         )
 
+        # Place the selected feature on detected face landmarks
+        auto_place_btn.click(
+            fn=session('auto_place'),
+            outputs=[image_display, status_text]
+        )
+
         # Confirm placement button
         confirm_btn.click(
-            fn=editor.confirm_placement,
+            fn=session('confirm_placement'),
             outputs=[image_display, status_text]
         )
 
         # Cancel preview button
         cancel_btn.click(
-            fn=editor.cancel_preview,
+            fn=session('cancel_preview'),
             outputs=[image_display, status_text]
         )
 
         # Control buttons
         undo_btn.click(
-            fn=editor.undo_last,
+            fn=session('undo_last'),
+            outputs=[image_display, status_text]
+        )
+
+        redo_btn.click(
+            fn=session('redo_last'),
             outputs=[image_display, status_text]
         )
 
         clear_btn.click(
-            fn=editor.clear_all,
+            fn=session('clear_all'),
+            outputs=[image_display, status_text]
+        )
+
+        # Edit a confirmed feature in place: load its values into the sliders, then move/apply
+        load_feature_btn.click(
+            fn=session('load_overlay'),
+            inputs=[feature_number],
+            outputs=[feature_preview, status_text, scale_slider, rotation_slider, opacity_slider]
+        )
+
+        edit_feature_btn.click(
+            fn=session('edit_overlay'),
+            inputs=[feature_number, scale_slider, rotation_slider, opacity_slider],
+            outputs=[image_display, status_text]
+        )
+
+        remove_feature_btn.click(
+            fn=session('remove_overlay'),
+            inputs=[feature_number],
             outputs=[image_display, status_text]
         )
 
         # Save button
         save_btn.click(
-            fn=editor.save_image,
-            inputs=[save_path_input],
+            fn=session('save_image'),
+            inputs=[save_path_input, export_presets],
             outputs=[save_status]
         )
 
+        # Poll the export workers so each output shows up as soon as it is written
+        export_timer.tick(
+            fn=export_status,
+            outputs=[export_status_box],
+            show_progress="hidden"
+        )
+
+        # Live try-on
+        live_start_btn.click(
+            fn=session('start_live_tryon'),
+            inputs=[live_fps_slider],
+            outputs=[live_status]
+        )
+
+        webcam_input.stream(
+            fn=session('stream_live_frame'),
+            inputs=[webcam_input],
+            outputs=[live_output, live_status],
+            trigger_mode="always_last",  # skip queued frames instead of piling them up
+            show_progress="hidden"
+        )
+
+        video_input.upload(
+            fn=session('stream_video_file'),
+            inputs=[video_input],
+            outputs=[live_output, live_status]
+        )
+
         # Update settings - THESE UPDATE THE PREVIEW IN REAL-TIME!
         scale_slider.change(
-            fn=editor.update_scale,
+            fn=session('update_scale'),
             inputs=[scale_slider],
             outputs=[image_display, status_text, feature_preview]
         )
 
         rotation_slider.change(
-            fn=editor.update_rotation,
+            fn=session('update_rotation'),
             inputs=[rotation_slider],
             outputs=[image_display, status_text, feature_preview]
         )
 
         opacity_slider.change(
-            fn=editor.update_opacity,
+            fn=session('update_opacity'),
             inputs=[opacity_slider],
             outputs=[image_display, status_text, feature_preview]
         )
 
         # Update overlay list when image changes
         image_display.change(
-            fn=editor.get_overlay_list,
+            fn=session('get_overlay_list'),
             outputs=[overlay_list]
         )
 
@@ -0,0 +1,195 @@
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+MANIFEST_NAME = "catalog.json"
+
+# Settings used for any category that the manifest doesn't override
+DEFAULT_CATEGORY_SETTINGS = {
+    'key_threshold': 650,  # r + g + b above this becomes transparent, None disables keying
+    'default_scale': 0.2,
+    'default_rotation': 0,
+    'default_opacity': 1.0,
+    'anchor': None,  # face landmark(s) for auto-placement (see face_landmarks.face_points), None = manual only
+    'face_width': None,  # auto-placed width of the visible feature as a fraction of the face width, None = default_scale
+}
+
+
+def feature_label(img_file: Path) -> str:
+    """Use filename without extension as the label"""
+    return img_file.stem.replace("_", " ").title()
+
+
+def load_feature_image(img_file: Path, key_threshold: Optional[int] = 650) -> Image.Image:
+    """Load a catalog PNG as RGBA, turning nearly-white pixels transparent"""
+    img = Image.open(img_file).convert("RGBA")
+    if key_threshold is None:
+        return img
+
+    data = np.array(img)
+    white = data[:, :, :3].sum(axis=2, dtype=np.uint16) > key_threshold
+    data[white] = (255, 255, 255, 0)
+    return Image.fromarray(data, 'RGBA')
+
+
+def load_manifest(assets_dir: Path) -> Dict[str, Dict]:
+    """
+    Read assets/catalog.json if present.
+
+    Format: {"categories": {"eyes": {"folder": "eye_images", "key_threshold": null,
+                                     "default_scale": 0.2}, ...}}
+    Missing keys fall back to DEFAULT_CATEGORY_SETTINGS and "folder" defaults to the category name.
+    """
+    manifest_file = assets_dir / MANIFEST_NAME
+    if not manifest_file.exists():
+        return {}
+
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"✗ Failed to read {manifest_file.name}: {e}")
+        return {}
+
+    return manifest.get('categories', {})
+
+
+def discover_categories(assets_dir: Path) -> Dict[str, Dict]:
+    """
+    Build the category table from the manifest plus any asset subfolders it doesn't mention.
+
+    Manifest categories keep their manifest order, discovered folders follow in alphabetical order.
+    """
+    categories = {}
+    claimed_folders = set()
+
+    for category, settings in load_manifest(assets_dir).items():
+        entry = dict(DEFAULT_CATEGORY_SETTINGS)
+        entry.update(settings)
+        entry['folder'] = assets_dir / settings.get('folder', category)
+        categories[category] = entry
+        claimed_folders.add(entry['folder'].name)
+
+    if assets_dir.exists():
+        for folder in sorted(assets_dir.iterdir()):
+            if not folder.is_dir() or folder.name in claimed_folders or folder.name.startswith('.'):
+                continue
+            entry = dict(DEFAULT_CATEGORY_SETTINGS)
+            entry['folder'] = folder
+            categories[folder.name] = entry
+
+    return categories
+
+
+def snapshot_assets(assets_dir: Path, categories: Dict[str, Dict]) -> Dict[Path, Tuple[str, float, int]]:
+    """Map every catalog PNG to (category, mtime, size) so two scans can be diffed"""
+    snapshot = {}
+    for category, settings in categories.items():
+        folder = settings['folder']
+        if not folder.exists():
+            continue
+        for img_file in folder.glob("*.png"):
+            try:
+                stat = img_file.stat()
+            except OSError:
+                continue  # removed between glob and stat
+            snapshot[img_file] = (category, stat.st_mtime, stat.st_size)
+    return snapshot
+
+
+def manifest_state(assets_dir: Path) -> Tuple:
+    """Cheap fingerprint of the manifest and the set of asset subfolders"""
+    manifest_file = assets_dir / MANIFEST_NAME
+    try:
+        manifest_mtime = manifest_file.stat().st_mtime
+    except OSError:
+        manifest_mtime = None
+    folders = tuple(sorted(p.name for p in assets_dir.iterdir() if p.is_dir())) if assets_dir.exists() else ()
+    return manifest_mtime, folders
+
+
+class CatalogWatcher:
+    """
+    Poll the assets folder and push added/changed/removed PNGs into a live catalog.
+
+    Polling keeps this dependency-free; a scan is just a few stat() calls per asset.
+    """
+
+    def __init__(self, assets_dir: Path,
+                 on_changed: Callable[[str, Path], None],
+                 on_removed: Callable[[str, Path], None],
+                 on_categories_changed: Callable[[Dict[str, Dict]], None],
+                 interval: float = 2.0):
+        self.assets_dir = assets_dir
+        self.on_changed = on_changed
+        self.on_removed = on_removed
+        self.on_categories_changed = on_categories_changed
+        self.interval = interval
+
+        self.categories = discover_categories(assets_dir)
+        self._manifest_state = manifest_state(assets_dir)
+        self._snapshot = snapshot_assets(assets_dir, self.categories)
+        self._stop = threading.Event()
+        self._poll_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"✗ Catalog watcher error: {e}")
+
+    def poll(self) -> List[Path]:
+        """Run one scan and dispatch callbacks; returns the files that were (re)loaded or removed"""
+        with self._poll_lock:
+            return self._poll()
+
+    def _poll(self) -> List[Path]:
+        # Categories whose settings changed need their images re-keyed even if the PNGs didn't change
+        resettled = set()
+        state = manifest_state(self.assets_dir)
+        if state != self._manifest_state:
+            self._manifest_state = state
+            old_categories = self.categories
+            self.categories = discover_categories(self.assets_dir)
+            resettled = {c for c, s in self.categories.items() if old_categories.get(c) != s}
+            self.on_categories_changed(self.categories)
+
+        current = snapshot_assets(self.assets_dir, self.categories)
+        touched = []
+
+        # Removals first: the catalog is keyed by label, so removing a file that moved away after
+        # loading its replacement (e.g. a category's folder was renamed) would drop the new entry
+        for img_file, (category, _, _) in self._snapshot.items():
+            if img_file not in current:
+                self.on_removed(category, img_file)
+                touched.append(img_file)
+            elif current[img_file][0] != category:
+                self.on_removed(category, img_file)
+
+        for img_file, (category, mtime, size) in current.items():
+            previous = self._snapshot.get(img_file)
+            if previous is None or previous != (category, mtime, size) or category in resettled:
+                self.on_changed(category, img_file)
+                touched.append(img_file)
+
+        self._snapshot = current
+        return touched
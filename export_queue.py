@@ -0,0 +1,266 @@
+import io
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from PIL import Image
+
+from render_cache import derived_key
+
+# Extra outputs that can be written next to the full-resolution file.
+# The full-size output takes its format from the save path extension.
+EXPORT_PRESETS = {
+    'web_jpeg': {'label': "Web JPEG (2048px)", 'suffix': "_web", 'format': 'JPEG', 'max_side': 2048,
+                 'options': {'quality': 85, 'optimize': True, 'progressive': True}},
+    'web_webp': {'label': "Web WebP (2048px)", 'suffix': "_web", 'format': 'WEBP', 'max_side': 2048,
+                 'options': {'quality': 80, 'method': 4}},
+    'thumbnail': {'label': "Thumbnail (256px)", 'suffix': "_thumb", 'format': 'JPEG', 'max_side': 256,
+                  'options': {'quality': 80}},
+}
+
+FORMAT_EXTENSIONS = {'PNG': '.png', 'JPEG': '.jpg', 'WEBP': '.webp'}
+
+
+def format_for_path(path: Path) -> Optional[str]:
+    """PIL format name for a save path, None to let PIL guess from the extension"""
+    ext = path.suffix.lower()
+    if ext in ('.jpg', '.jpeg'):
+        return 'JPEG'
+    if ext in ('.png', ''):
+        return 'PNG'
+    if ext == '.webp':
+        return 'WEBP'
+    return None
+
+
+def flatten_to_rgb(image: Image.Image) -> Image.Image:
+    """Convert RGBA to RGB on white (for formats without transparency support)"""
+    if image.mode != 'RGBA':
+        return image.convert('RGB')
+    rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+    rgb_image.paste(image, mask=image.split()[3])
+    return rgb_image
+
+
+class ExportSource:
+    """
+    A composited image that outputs are encoded from; sized copies are made once and shared.
+
+    Pass either the image or a render() callable - the latter only runs if some output isn't cached.
+    """
+
+    def __init__(self, image: Optional[Image.Image] = None, render: Optional[Callable[[], Image.Image]] = None):
+        self._image = image
+        self._render = render
+        self._lock = threading.Lock()
+        self._variants = {}
+        self._planned_sides = []
+
+    def plan(self, max_sides: List[Optional[int]]):
+        """Told by the queue which sizes a job will ask for, before any output is written"""
+        self._planned_sides = [side for side in max_sides if side is not None]
+
+    @property
+    def image(self) -> Image.Image:
+        if self._image is None:
+            self._image = self._render()
+        return self._image
+
+    def variant(self, max_side: Optional[int], rgb: bool) -> Image.Image:
+        """The image fitted into max_side (None = full size), optionally flattened to RGB"""
+        with self._lock:
+            return self._variant(max_side, rgb)
+
+    def _variant(self, max_side: Optional[int], rgb: bool) -> Image.Image:
+        key = (max_side, rgb)
+        if key not in self._variants:
+            if rgb:
+                self._variants[key] = flatten_to_rgb(self._variant(max_side, False))
+            else:
+                self._variants[key] = self._resized(max_side)
+        return self._variants[key]
+
+    def _resized(self, max_side: Optional[int]) -> Image.Image:
+        if max_side is None or max(self.image.size) <= max_side:
+            return self.image
+        resized = self.image.copy()
+        resized.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        return resized
+
+    def write_full(self, path: Path, fmt: Optional[str]) -> bool:
+        """Hook for sources that can write the full-size output faster; False = use variant()"""
+        return False
+
+
+class TiledExportSource(ExportSource):
+    """
+    Export source backed by a TiledImage: the full-size PNG is streamed, other sizes use previews.
+
+    Other full-size formats need the whole image in RAM - one frame, flattened band by band when the
+    format has no alpha.
+    """
+
+    def __init__(self, tiled, editor, overlays: List[Dict], ratio: float):
+        super().__init__()
+        self.size = tiled.size
+        self.tiled = tiled
+        self.editor = editor
+        self.overlays = overlays
+        self.ratio = ratio
+        self._preview = None
+        self._preview_side = 0  # max_side the preview was built for
+
+    def _variant(self, max_side: Optional[int], rgb: bool) -> Image.Image:
+        key = (max_side, rgb)
+        if rgb and key not in self._variants and (max_side is None or max(self.size) <= max_side):
+            # Straight into one RGB frame instead of an RGBA frame plus its flattened copy
+            self._variants[key] = self._full_rgb()
+        return super()._variant(max_side, rgb)
+
+    def _full_rgb(self) -> Image.Image:
+        result = Image.new('RGB', self.size)
+        y0 = 0
+        for band in self.tiled.iter_bands(self.editor, self.overlays, self.ratio):
+            result.paste(flatten_to_rgb(Image.fromarray(band, 'RGBA')), (0, y0))
+            y0 += band.shape[0]
+        return result
+
+    def _resized(self, max_side: Optional[int]) -> Image.Image:
+        if max_side is None or max(self.size) <= max_side:
+            # Only non-streamable formats with alpha get here
+            return self.tiled.to_image(self.editor, self.overlays, self.ratio)
+        # One box-filtered pass over the tiles for the largest planned size; every smaller size is an
+        # exact fit of that preview - never holds the full image
+        if self._preview is None or self._preview_side < max_side:
+            self._preview_side = max([max_side] + self._planned_sides)
+            self._preview = self.tiled.preview(self._preview_side * 2, self.editor, self.overlays, self.ratio)
+        resized = self._preview.copy()
+        resized.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        return resized
+
+    def write_full(self, path: Path, fmt: Optional[str]) -> bool:
+        if fmt != 'PNG':
+            return False
+        self.tiled.export_png(path, self.editor, self.overlays, self.ratio)
+        return True
+
+
+class ExportQueue:
+    """
+    Encode export jobs on a worker pool so the UI handler returns immediately.
+
+    A job is one composited image plus several outputs (full size + presets); each output is encoded
+    as its own task, so they run in parallel (PIL releases the GIL while encoding).
+    """
+
+    def __init__(self, max_workers: int = 4, history: int = 20):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export")
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._history = history
+        self.jobs: Dict[int, Dict] = {}
+
+    def submit(self, source: ExportSource, save_path: Path, presets: List[str],
+               cache=None, cache_key: Optional[str] = None, owner: Optional[str] = None) -> int:
+        """
+        Queue the full-size output plus the given presets; returns the job id.
+
+        With a RenderCache and the recipe's cache_key, outputs already encoded for the same image and
+        overlays are copied from the cache instead of being rendered and encoded again. owner (a
+        session id) limits who sees the job in status_text().
+        """
+        job_id = next(self._ids)
+        fmt = format_for_path(save_path)
+        outputs = [{'name': "Full size", 'path': save_path, 'format': fmt, 'max_side': None,
+                    'options': {'quality': 95} if fmt == 'JPEG' else {}, 'status': "queued"}]
+        for preset_name in presets:
+            preset = EXPORT_PRESETS[preset_name]
+            path = save_path.with_name(save_path.stem + preset['suffix'] + FORMAT_EXTENSIONS[preset['format']])
+            outputs.append({'name': preset['label'], 'path': path, 'format': preset['format'],
+                            'max_side': preset['max_side'], 'options': preset['options'], 'status': "queued"})
+
+        for output in outputs:
+            output['cache_key'] = None
+            if cache is not None and cache_key is not None:
+                output['cache_key'] = derived_key(cache_key, format=output['format'] or save_path.suffix.lower(),
+                                                  max_side=output['max_side'], options=output['options'])
+
+        job = {'id': job_id, 'created': datetime.now(), 'owner': owner, 'outputs': outputs}
+        with self._lock:
+            self.jobs[job_id] = job
+            for old_id in sorted(self.jobs)[:-self._history]:
+                if all(o['status'] not in ("queued", "writing") for o in self.jobs[old_id]['outputs']):
+                    del self.jobs[old_id]
+
+        source.plan([output['max_side'] for output in outputs])
+        for output in outputs:
+            self._pool.submit(self._write_output, source, output, cache)
+        return job_id
+
+    def _write_output(self, source: ExportSource, output: Dict, cache=None):
+        output['status'] = "writing"
+        path = output['path']
+        key = output['cache_key']
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if key is not None and cache.copy_to(key, path):
+                output['status'] = "done (cached)"
+                return
+
+            fmt = output['format']
+            if output['max_side'] is None and source.write_full(path, fmt):
+                if key is not None:
+                    cache.put_file(key, path)
+            else:
+                # Encode in memory so the same bytes can go to the file and the cache
+                fmt = fmt or Image.registered_extensions().get(path.suffix.lower())
+                if fmt is None:
+                    raise ValueError(f"unknown file extension: {path.suffix}")
+                image = source.variant(output['max_side'], rgb=fmt == 'JPEG')
+                buffer = io.BytesIO()
+                image.save(buffer, fmt, **output['options'])
+                data = buffer.getvalue()
+                path.write_bytes(data)
+                if key is not None:
+                    cache.put(key, data)
+            output['status'] = "done"
+        except PermissionError:
+            output['status'] = "error: permission denied"
+        except Exception as e:
+            output['status'] = f"error: {e}"
+
+    def status_text(self, limit: int = 5, owner: Optional[str] = None) -> str:
+        """Human-readable status of the most recent jobs (only those submitted by owner, if given)"""
+        with self._lock:
+            jobs = [self.jobs[i] for i in sorted(self.jobs, reverse=True)
+                    if owner is None or self.jobs[i]['owner'] == owner][:limit]
+        if not jobs:
+            return "No exports yet"
+
+        icons = {"queued": "⏳", "writing": "✍️", "done": "✅", "done (cached)": "⚡"}
+        lines = []
+        for job in jobs:
+            lines.append(f"Job #{job['id']} ({job['created'].strftime('%H:%M:%S')})")
+            for output in job['outputs']:
+                icon = icons.get(output['status'], "❌")
+                lines.append(f"  {icon} {output['name']}: {output['path'].absolute()} [{output['status']}]")
+        return "\n".join(lines)
+
+    def wait(self, job_id: int, timeout: Optional[float] = None) -> bool:
+        """Block until every output of a job is finished (for scripts); False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                outputs = self.jobs[job_id]['outputs']
+            if all(o['status'] not in ("queued", "writing") for o in outputs):
+                return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
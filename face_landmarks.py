@@ -0,0 +1,166 @@
+import json
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+try:
+    import cv2  # optional - only needed for automatic placement
+except ImportError:
+    cv2 = None
+
+# Drop a YuNet face model here (opencv_zoo face_detection_yunet_*.onnx) for detection that also
+# handles tilted faces; otherwise OpenCV's bundled Haar cascades are used. Not under assets/ - every
+# subfolder there becomes a catalog category
+YUNET_MODEL = Path(__file__).parent / "models" / "face_detection_yunet.onnx"
+
+# Detection runs on a copy no larger than this; landmarks are scaled back to the image
+DETECT_MAX_SIDE = 640
+
+# Bump when detection or landmark geometry changes, so cached results aren't reused
+LANDMARKS_VERSION = 1
+
+
+def _point(p) -> np.ndarray:
+    return np.asarray(p, dtype=np.float64)
+
+
+def face_points(box: Tuple[float, float, float, float], left_eye, right_eye,
+                nose=None, mouth=None) -> Dict[str, List[float]]:
+    """
+    Named anchor points of one face from its box and eye centers (left/right as seen in the image).
+
+    The rest is placed along the face's own axes, so anchors follow a tilted head. Detectors that
+    find the nose tip or mouth pass them in; otherwise they're estimated from average proportions.
+    """
+    x, y, w, h = box
+    left_eye, right_eye = _point(left_eye), _point(right_eye)
+    eye_line = right_eye - left_eye
+    across = eye_line / (np.linalg.norm(eye_line) or 1.0)  # unit vector to the image-right side of the face
+    down = np.array([-across[1], across[0]])  # unit vector from forehead to chin
+    center = (left_eye + right_eye) / 2
+    nose = _point(nose) if nose is not None else center + down * 0.28 * w
+    mouth = _point(mouth) if mouth is not None else center + down * 0.52 * w
+
+    points = {
+        'left_eye': left_eye,
+        'right_eye': right_eye,
+        'eyes': center,
+        'left_brow': left_eye - down * 0.11 * w,
+        'right_brow': right_eye - down * 0.11 * w,
+        'nose': nose,
+        'upper_lip': nose + (mouth - nose) * 0.6,
+        'mouth': mouth,
+        'left_cheek': mouth - across * 0.28 * w - down * 0.05 * w,
+        'right_cheek': mouth + across * 0.28 * w - down * 0.05 * w,
+        'jaw': mouth + down * 0.05 * w,
+        'left_ear': left_eye - across * 0.42 * w + down * 0.2 * w,
+        'right_ear': right_eye + across * 0.42 * w + down * 0.2 * w,
+        'hair': center - down * 0.6 * w,
+    }
+    return {name: [float(p[0]), float(p[1])] for name, p in points.items()}
+
+
+class FaceLandmarkDetector:
+    """
+    Offline CPU face + landmark detection.
+
+    Backends, best first: a YuNet ONNX model (face box, eyes, nose tip and mouth corners) run by
+    OpenCV's DNN module, or the Haar cascades that ship with opencv-python (face box and eyes, the
+    rest from proportions). Without OpenCV, backend is None and detect() finds nothing.
+    """
+
+    def __init__(self, model_path: Optional[Path] = YUNET_MODEL, score_threshold: float = 0.7):
+        self.backend = None
+        self._yunet = None
+        self._face_cascade = None
+        self._eye_cascade = None
+        if cv2 is None:
+            return
+        if model_path is not None and Path(model_path).exists() and hasattr(cv2, 'FaceDetectorYN'):
+            self._yunet = cv2.FaceDetectorYN.create(str(model_path), "", (320, 320), score_threshold)
+            self.backend = 'yunet'
+        elif hasattr(cv2, 'CascadeClassifier') and hasattr(cv2, 'data'):
+            self._face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+            self._eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_eye.xml")
+            if not self._face_cascade.empty():
+                self.backend = 'haar'
+
+    def detect(self, img: Image.Image) -> List[Dict]:
+        """Faces in img, largest first: [{'box': [x, y, w, h], 'points': {name: [x, y]}}]"""
+        if self.backend is None:
+            return []
+        factor = max(1.0, max(img.size) / DETECT_MAX_SIDE)
+        small = img.convert('RGB')
+        if factor > 1.0:
+            small = small.resize((max(1, round(img.width / factor)), max(1, round(img.height / factor))),
+                                 Image.Resampling.BILINEAR)
+        pixels = np.asarray(small)
+
+        faces = self._detect_yunet(pixels) if self.backend == 'yunet' else self._detect_haar(pixels)
+        faces.sort(key=lambda face: face['box'][2] * face['box'][3], reverse=True)
+        for face in faces:
+            face['box'] = [v * factor for v in face['box']]
+            face['points'] = {name: [p[0] * factor, p[1] * factor] for name, p in face['points'].items()}
+        return faces
+
+    def _detect_yunet(self, pixels: np.ndarray) -> List[Dict]:
+        height, width = pixels.shape[:2]
+        self._yunet.setInputSize((width, height))
+        _, detections = self._yunet.detect(cv2.cvtColor(pixels, cv2.COLOR_RGB2BGR))
+        faces = []
+        for row in detections if detections is not None else []:
+            box = [float(v) for v in row[:4]]
+            # Landmarks are the subject's right eye, left eye, nose tip, right and left mouth corner
+            marks = row[4:14].reshape(5, 2)
+            left_eye, right_eye = sorted((marks[0], marks[1]), key=lambda p: p[0])
+            mouth = (marks[3] + marks[4]) / 2
+            faces.append({'box': box, 'points': face_points(box, left_eye, right_eye, marks[2], mouth)})
+        return faces
+
+    def _detect_haar(self, pixels: np.ndarray) -> List[Dict]:
+        gray = cv2.equalizeHist(cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY))
+        min_side = max(24, min(gray.shape) // 10)
+        faces = []
+        for x, y, w, h in self._face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5,
+                                                              minSize=(min_side, min_side)):
+            box = [float(x), float(y), float(w), float(h)]
+            left_eye, right_eye = self._haar_eyes(gray, box)
+            faces.append({'box': box, 'points': face_points(box, left_eye, right_eye)})
+        return faces
+
+    def _haar_eyes(self, gray: np.ndarray, box) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+        """Eye centers within the upper half of a face box, falling back to average positions"""
+        x, y, w, h = (int(v) for v in box)
+        guess = ((x + 0.3 * w, y + 0.38 * h), (x + 0.7 * w, y + 0.38 * h))
+        if self._eye_cascade.empty():
+            return guess
+        region = gray[y:y + h // 2 + h // 10, x:x + w]
+        eyes = self._eye_cascade.detectMultiScale(region, scaleFactor=1.1, minNeighbors=5,
+                                                  minSize=(max(8, w // 10), max(8, w // 10)))
+        # Best candidate on each half of the face
+        sides = [None, None]
+        for ex, ey, ew, eh in eyes:
+            cx, cy = x + ex + ew / 2, y + ey + eh / 2
+            side = 0 if cx < x + w / 2 else 1
+            if sides[side] is None or ew * eh > sides[side][1]:
+                sides[side] = ((cx, cy), ew * eh)
+        if sides[0] is None or sides[1] is None:
+            return guess
+        return sides[0][0], sides[1][0]
+
+
+def landmarks_to_bytes(faces: List[Dict]) -> bytes:
+    return json.dumps(faces).encode()
+
+
+def landmarks_from_bytes(data: bytes) -> List[Dict]:
+    return json.loads(data.decode())
+
+
+def face_roll(face: Dict) -> float:
+    """Head tilt in degrees, as a PIL rotate() angle that lines a feature up with the eyes"""
+    (lx, ly), (rx, ry) = face['points']['left_eye'], face['points']['right_eye']
+    return -math.degrees(math.atan2(ry - ly, rx - lx))
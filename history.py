@@ -0,0 +1,151 @@
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Default in-memory budget for undo/redo pixel patches; older entries spill to disk beyond this
+DEFAULT_MEMORY_CAP = 64 * 1024 * 1024
+
+Overlay = Dict
+OverlayState = Union[None, Overlay, List[Overlay]]
+
+
+class HistoryEntry:
+    """
+    One edit: what changed in the overlay list plus the pixels it changed.
+
+    op is 'add', 'edit', 'remove' or 'clear'. before/after are the overlay at index (the whole overlay
+    list for 'clear'). box is the dirty region (x0, y0, x1, y1) of the confirmed composite and
+    before_patch/after_patch its RGBA pixels, so undo/redo is a paste instead of a full re-render.
+    """
+
+    def __init__(self, op: str, index: int, before: OverlayState, after: OverlayState,
+                 box: Optional[Tuple[int, int, int, int]], before_patch: Optional[np.ndarray],
+                 after_patch: Optional[np.ndarray], catalog_version: int = 0):
+        self.op = op
+        self.index = index
+        self.before = before
+        self.after = after
+        self.box = box
+        self.catalog_version = catalog_version
+        self._patches = (before_patch, after_patch)
+        self.spill_path = None
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of pixel data currently held in RAM"""
+        if self._patches is None:
+            return 0
+        return sum(p.nbytes for p in self._patches if p is not None)
+
+    def spill(self, directory: Path, name: str):
+        """Move the pixel patches to disk"""
+        if self._patches is None or self.nbytes == 0:
+            return
+        self.spill_path = directory / f"{name}.npz"
+        before_patch, after_patch = self._patches
+        np.savez(self.spill_path,
+                 before=before_patch if before_patch is not None else np.empty(0, np.uint8),
+                 after=after_patch if after_patch is not None else np.empty(0, np.uint8))
+        self._patches = None
+
+    def patches(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """(before_patch, after_patch), reading them back from disk if they were spilled"""
+        if self._patches is not None:
+            return self._patches
+        with np.load(self.spill_path) as data:
+            return tuple(data[k] if data[k].size else None for k in ('before', 'after'))
+
+    def discard(self):
+        """Free pixel data and remove any spill file"""
+        self._patches = None
+        if self.spill_path is not None:
+            self.spill_path.unlink(missing_ok=True)
+            self.spill_path = None
+
+
+class EditHistory:
+    """
+    Linear undo/redo stack of HistoryEntry deltas with a RAM cap.
+
+    Undo/redo only move a cursor; the caller applies the returned entry. When the patches held in RAM
+    exceed memory_cap, the oldest entries are spilled to a temporary directory and read back on demand.
+    """
+
+    def __init__(self, memory_cap: int = DEFAULT_MEMORY_CAP, spill_dir: Optional[Path] = None):
+        self.memory_cap = memory_cap
+        self._spill_root = spill_dir
+        self._spill_dir = None
+        self._entries: List[HistoryEntry] = []
+        self._cursor = 0  # entries[:cursor] are applied, entries[cursor:] can be redone
+        self._counter = 0
+        self.memory_bytes = 0
+
+    def can_undo(self) -> bool:
+        return self._cursor > 0
+
+    def can_redo(self) -> bool:
+        return self._cursor < len(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def push(self, entry: HistoryEntry):
+        """Record a new edit, dropping anything that could have been redone"""
+        for stale in self._entries[self._cursor:]:
+            self.memory_bytes -= stale.nbytes
+            stale.discard()
+        del self._entries[self._cursor:]
+
+        self._entries.append(entry)
+        self._cursor += 1
+        self.memory_bytes += entry.nbytes
+        self._enforce_cap()
+
+    def undo(self) -> Optional[HistoryEntry]:
+        if not self.can_undo():
+            return None
+        self._cursor -= 1
+        return self._entries[self._cursor]
+
+    def redo(self) -> Optional[HistoryEntry]:
+        if not self.can_redo():
+            return None
+        entry = self._entries[self._cursor]
+        self._cursor += 1
+        return entry
+
+    def clear(self):
+        for entry in self._entries:
+            entry.discard()
+        self._entries = []
+        self._cursor = 0
+        self.memory_bytes = 0
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+
+    def spill_all(self):
+        """Move every patch to disk, e.g. while the session is idle"""
+        self._enforce_cap(0)
+
+    def _enforce_cap(self, cap: Optional[int] = None):
+        cap = self.memory_cap if cap is None else cap
+        # Oldest first - they are the least likely to be needed again
+        for entry in self._entries:
+            if self.memory_bytes <= cap:
+                break
+            size = entry.nbytes
+            if size == 0:
+                continue
+            if self._spill_dir is None:
+                self._spill_dir = Path(tempfile.mkdtemp(prefix="catalog_history_", dir=self._spill_root))
+            self._counter += 1
+            entry.spill(self._spill_dir, f"entry_{self._counter}")
+            self.memory_bytes -= size
+
+    def __del__(self):
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
@@ -0,0 +1,53 @@
+import hashlib
+from pathlib import Path
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+EXIF_ORIENTATION = 0x0112
+
+
+def file_digest(path) -> str:
+    """Content hash of an uploaded file, read in chunks"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def oriented_size(img: Image.Image) -> Tuple[int, int]:
+    """Size after applying EXIF orientation, without decoding any pixels"""
+    orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+    if orientation in (5, 6, 7, 8):  # rotated by 90 degrees one way or the other
+        return img.height, img.width
+    return img.size
+
+
+def load_working_image(path, max_side: Optional[int] = None) -> Tuple[Image.Image, Tuple[int, int]]:
+    """
+    Decode an upload straight into an upright RGBA working image; returns (image, full oriented size).
+
+    Images larger than max_side are shrunk while decoding: JPEG draft mode decodes at 1/2, 1/4 or
+    1/8 scale, so full-size pixels of large phone photos are never held in RAM (other formats are
+    decoded, then reduced). The orientation fix runs on the (already reduced) decoded image before the
+    RGBA conversion, and an upload that is already RGBA is used as decoded: an upright photo costs one
+    copy for the RGBA buffer, an EXIF-rotated one a second, rotated copy of the decoded frame.
+    """
+    img = Image.open(Path(path))
+    full_size = oriented_size(img)
+
+    if max_side is not None and max(img.size) > max_side:
+        ratio = max_side / max(img.size)
+        # JPEG: decode at the smallest 1/2, 1/4, 1/8 scale that is still at least the target size
+        img.draft('RGB' if img.mode == 'RGB' else None,
+                  (max(1, int(img.width * ratio)), max(1, int(img.height * ratio))))
+        # Then reduce()/resize the (much smaller) decoded frame the rest of the way
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    else:
+        img.load()
+
+    img = ImageOps.exif_transpose(img) if img.getexif().get(EXIF_ORIENTATION, 1) != 1 else img
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    return img, full_size
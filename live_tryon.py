@@ -0,0 +1,149 @@
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from compositing import plan_overlays
+
+try:
+    import cv2  # optional - only needed to read .mp4/.avi/... files
+except ImportError:
+    cv2 = None
+
+
+class LiveTryOn:
+    """
+    Apply a fixed overlay set to a stream of webcam or video frames.
+
+    Each overlay is transformed once per frame size (via the editor's transform cache) and blended into
+    a small ring of reused frame buffers. Frames arriving faster than target_fps, or while the previous
+    frame is still being composited, are dropped and the last composited frame is returned instead.
+    """
+
+    def __init__(self, editor, target_fps: float = 15.0, ring_size: int = 3):
+        self.editor = editor
+        self.target_fps = target_fps
+        self.overlays = []
+        self.reference_size = None  # (w, h) of the image the overlays were placed on
+        self._plans = []
+        self._plan_size = None
+        self._buffers = []
+        self._ring_size = ring_size
+        self._next_buffer = 0
+        self._last_output = None
+        self._last_frame_time = 0.0
+        self._busy = threading.Lock()
+        self.stats = {'processed': 0, 'dropped': 0, 'fps': 0.0}
+
+    def set_overlays(self, overlays: List[Dict], reference_size: Optional[Tuple[int, int]] = None):
+        """Freeze the overlay set to stream; positions/scales are relative to reference_size"""
+        with self._busy:
+            self.overlays = [dict(o) for o in overlays]
+            self.reference_size = reference_size
+            self._plan_size = None  # force re-planning on the next frame
+            self.stats = {'processed': 0, 'dropped': 0, 'fps': 0.0}
+
+    def _prepare(self, frame_size: Tuple[int, int]):
+        """Pre-transform every overlay for this frame size and (re)allocate the frame buffers"""
+        ratio = 1.0
+        if self.reference_size:
+            # Webcam frames rarely match the photo the features were placed on - map by width
+            ratio = frame_size[0] / self.reference_size[0]
+
+        self._plans = plan_overlays(self.editor, self.overlays, frame_size, ratio)
+
+        self._buffers = []
+        self._plan_size = frame_size
+
+    def composite_frame(self, frame: np.ndarray) -> np.ndarray:
+        """Composite the overlay set onto one RGB(A) uint8 frame; the result is a reused buffer"""
+        frame_size = (frame.shape[1], frame.shape[0])
+        if frame_size != self._plan_size:
+            self._prepare(frame_size)
+
+        if not self._buffers or self._buffers[0].shape != frame.shape:
+            # Ring of buffers so a frame handed to the UI isn't overwritten while it is still being sent
+            self._buffers = [np.empty(frame.shape, dtype=np.uint8) for _ in range(self._ring_size)]
+            self._next_buffer = 0
+
+        out = self._buffers[self._next_buffer]
+        self._next_buffer = (self._next_buffer + 1) % self._ring_size
+        np.copyto(out, frame, casting='unsafe')
+
+        for plan in self._plans:
+            plan.blend_into(out)
+        return out
+
+    def process(self, frame: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """Streaming handler: composite the frame, or drop it under backpressure"""
+        if frame is None:
+            return self._last_output
+
+        now = time.perf_counter()
+        if self.target_fps and now - self._last_frame_time < 1.0 / self.target_fps:
+            self.stats['dropped'] += 1
+            return self._last_output
+
+        if not self._busy.acquire(blocking=False):
+            self.stats['dropped'] += 1
+            return self._last_output
+        try:
+            out = self.composite_frame(frame)
+        finally:
+            self._busy.release()
+
+        self._record_frame(now)
+        self._last_output = out
+        return out
+
+    def _record_frame(self, now: float):
+        """Update the processed count and a smoothed fps estimate"""
+        if self._last_frame_time:
+            instant_fps = 1.0 / max(now - self._last_frame_time, 1e-6)
+            self.stats['fps'] = 0.9 * self.stats['fps'] + 0.1 * instant_fps if self.stats['fps'] else instant_fps
+        self._last_frame_time = now
+        self.stats['processed'] += 1
+
+    def stream_video(self, video_path) -> Iterator[np.ndarray]:
+        """Composite every frame of a video file, paced to target_fps (stand-in for a webcam)"""
+        interval = 1.0 / self.target_fps if self.target_fps else 0.0
+        for frame in iter_video_frames(video_path):
+            started = time.perf_counter()
+            out = self.composite_frame(frame)
+            self._record_frame(started)
+            # The ring buffer is reused, so hand out a copy that outlives the next frames
+            yield out.copy()
+            remaining = interval - (time.perf_counter() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def memory_bytes(self) -> int:
+        """RAM held by the output ring buffers"""
+        return sum(buffer.nbytes for buffer in self._buffers)
+
+    def status(self) -> str:
+        return (f"🎥 {len(self.overlays)} features | {self.stats['fps']:.1f} fps | "
+                f"{self.stats['processed']} processed, {self.stats['dropped']} dropped")
+
+
+def iter_video_frames(video_path) -> Iterator[np.ndarray]:
+    """Yield RGB frames from a video file (OpenCV if installed) or an animated GIF/PNG/TIFF (PIL)"""
+    video_path = Path(video_path)
+    if video_path.suffix.lower() in ('.gif', '.png', '.apng', '.tif', '.tiff', '.webp') or cv2 is None:
+        with Image.open(video_path) as clip:
+            for frame in ImageSequence.Iterator(clip):
+                yield np.asarray(frame.convert('RGB'))
+        return
+
+    capture = cv2.VideoCapture(str(video_path))
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    finally:
+        capture.release()
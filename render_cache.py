@@ -0,0 +1,218 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+DEFAULT_DISK_LIMIT = 2 * 1024 * 1024 * 1024
+
+
+def array_digest(arr: np.ndarray) -> str:
+    """Content hash of an image array (shape and dtype included, so a reshaped buffer differs)"""
+    h = hashlib.sha256(f"{arr.shape}|{arr.dtype}|".encode())
+    h.update(memoryview(np.ascontiguousarray(arr)).cast('B'))
+    return h.hexdigest()
+
+
+def recipe_key(base_digest: str, overlays: List[Dict], asset_digests: Dict) -> str:
+    """
+    Cache key for a base image plus an overlay list.
+
+    Overlays are canonicalized (fixed key order, numbers normalized, catalog image content hash instead
+    of just its name) so equal recipes hash equally and a hot-reloaded asset never hits a stale entry.
+    Order is kept - later overlays are drawn on top.
+    """
+    canonical = []
+    for overlay in overlays:
+        canonical.append({
+            'asset': asset_digests.get((overlay['category'], overlay['name']),
+                                       f"{overlay['category']}/{overlay['name']}"),
+            'x': int(overlay['x']),
+            'y': int(overlay['y']),
+            'scale': round(float(overlay['scale']), 6),
+            'rotation': round(float(overlay['rotation']), 6),
+            'opacity': round(float(overlay['opacity']), 6),
+        })
+    payload = json.dumps({'base': base_digest, 'overlays': canonical}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def derived_key(key: str, **params) -> str:
+    """Key for something derived from a cached render (an encoded output, a resized copy...)"""
+    payload = json.dumps({'key': key, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class RenderCache:
+    """
+    Two-tier content-addressed cache: a RAM LRU in front of a directory LRU, both limited by bytes.
+
+    Values are opaque bytes (encoded files, serialized arrays). Items larger than max_memory_item go
+    straight to disk. The disk index is rebuilt from file mtimes on startup, so it survives restarts.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, memory_limit: int = DEFAULT_MEMORY_LIMIT,
+                 disk_limit: int = DEFAULT_DISK_LIMIT, max_memory_item: Optional[int] = None):
+        self.directory = Path(directory) if directory is not None else None
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.max_memory_item = max_memory_item if max_memory_item is not None else memory_limit // 4
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> bytes
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> size, oldest first
+        self._disk_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0}
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            files = []
+            for path in self.directory.glob("*.bin"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, path.stem, stat.st_size))
+            for _, key, size in sorted(files):
+                self._disk[key] = size
+                self._disk_bytes += size
+            self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.bin"
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._memory or key in self._disk
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.stats['hits'] += 1
+                return data
+            if key not in self._disk:
+                self.stats['misses'] += 1
+                return None
+            self._disk.move_to_end(key)
+
+        try:
+            data = self._path(key).read_bytes()
+            os.utime(self._path(key))
+        except OSError:
+            with self._lock:
+                self._forget_disk(key)
+                self.stats['misses'] += 1
+            return None
+
+        with self._lock:
+            self.stats['hits'] += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes):
+        with self._lock:
+            self._remember(key, data)
+        if self.directory is not None and key not in self._disk:
+            self._write_disk(key, lambda tmp: tmp.write_bytes(data), len(data))
+
+    def copy_to(self, key: str, dest: Path) -> bool:
+        """Write a cached value straight to a file; False on a miss"""
+        with self._lock:
+            data = self._memory.get(key)
+            on_disk = key in self._disk
+            if data is not None:
+                self._memory.move_to_end(key)
+            if on_disk:
+                self._disk.move_to_end(key)
+            if data is None and not on_disk:
+                self.stats['misses'] += 1
+                return False
+            self.stats['hits'] += 1
+
+        if data is not None:
+            dest.write_bytes(data)
+            return True
+        try:
+            shutil.copyfile(self._path(key), dest)
+            os.utime(self._path(key))
+            return True
+        except OSError:
+            with self._lock:
+                self._forget_disk(key)
+            return False
+
+    def put_file(self, key: str, src: Path):
+        """Cache the contents of a file (e.g. a streamed export) without reading it into memory"""
+        size = src.stat().st_size
+        if size <= self.max_memory_item or self.directory is None:
+            self.put(key, src.read_bytes())
+            return
+        self._write_disk(key, lambda tmp: shutil.copyfile(src, tmp), size)
+
+    def get_array(self, key: str) -> Optional[np.ndarray]:
+        data = self.get(key)
+        if data is None:
+            return None
+        return np.load(io.BytesIO(data), allow_pickle=False)
+
+    def put_array(self, key: str, arr: np.ndarray):
+        buffer = io.BytesIO()
+        np.save(buffer, arr, allow_pickle=False)
+        self.put(key, buffer.getvalue())
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for key in list(self._disk):
+                self._forget_disk(key)
+
+    def _remember(self, key: str, data: bytes):
+        """Add to the RAM tier (lock held)"""
+        if len(data) > self.max_memory_item or key in self._memory:
+            return
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _write_disk(self, key: str, write, size: int):
+        # Write to a temp name and rename so readers never see a half-written file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        tmp = Path(tmp)
+        try:
+            write(tmp)
+            os.replace(tmp, self._path(key))
+        except OSError as e:
+            tmp.unlink(missing_ok=True)
+            print(f"✗ Render cache write failed: {e}")
+            return
+        with self._lock:
+            if key in self._disk:
+                self._disk_bytes -= self._disk[key]
+            self._disk[key] = size
+            self._disk_bytes += size
+            self._evict()
+
+    def _forget_disk(self, key: str):
+        """Drop a disk entry (lock held)"""
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+            self._path(key).unlink(missing_ok=True)
+
+    def _evict(self):
+        while self._disk_bytes > self.disk_limit and self._disk:
+            self._forget_disk(next(iter(self._disk)))
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from PIL import Image
+
+# Total RAM that open sessions may hold before the least recently used idle ones go to disk
+DEFAULT_MEMORY_BUDGET = 2 * 1024 * 1024 * 1024
+# Sessions untouched for this long are spilled even under budget; spilled ones are dropped after expire
+DEFAULT_IDLE_SECONDS = 15 * 60
+DEFAULT_EXPIRE_SECONDS = 24 * 60 * 60
+
+
+class _Session:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.editor = None  # None while spilled (or not created yet)
+        self.users = 0  # handlers currently running on this session - never spilled while > 0
+        self.last_used = time.monotonic()
+        self.nbytes = 0
+        self.spilled = None  # {'recipe': Path, 'image': Path or None, 'tiled_base', 'history'} when on disk
+        self.lock = threading.Lock()  # held while spilling / rehydrating
+
+
+class SessionManager:
+    """
+    Per-browser-session editors under one global memory budget.
+
+    factory(session_id) creates the editor of a new (or rehydrated) session.
+
+    Every handler runs on its session's editor via use(). Afterwards the session's RAM is re-measured
+    and, if the total is over memory_budget, the sweeper thread (see start()) is woken to spill the
+    least recently used idle sessions - requests never encode other sessions themselves. Spilling
+    writes the base image to a PNG, the editing state to a JSON recipe and the undo patches to the
+    history's own spill files. The next request for a spilled session rehydrates it transparently.
+    Full-resolution TiledImages are already disk-backed and are kept as they are.
+    """
+
+    def __init__(self, factory: Callable[[str], object], memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 idle_seconds: Optional[float] = DEFAULT_IDLE_SECONDS,
+                 expire_seconds: Optional[float] = DEFAULT_EXPIRE_SECONDS, spill_dir: Optional[Path] = None):
+        self.factory = factory
+        self.memory_budget = memory_budget
+        self.idle_seconds = idle_seconds
+        self.expire_seconds = expire_seconds
+        self.spill_dir = Path(tempfile.mkdtemp(prefix="catalog_sessions_", dir=spill_dir))
+        self._sessions: Dict[str, _Session] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = {'spilled': 0, 'rehydrated': 0, 'expired': 0}
+
+    @contextmanager
+    def use(self, session_id: str):
+        """The editor of a session (created or rehydrated as needed), pinned in RAM while in use"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(session_id)
+            session.users += 1
+            session.last_used = time.monotonic()
+
+        try:
+            with session.lock:
+                if session.editor is None:
+                    session.editor = self._rehydrate(session) if session.spilled else self.factory(session_id)
+            yield session.editor
+        finally:
+            nbytes = session.editor.memory_bytes() if session.editor is not None else 0
+            with self._lock:
+                session.users -= 1
+                session.last_used = time.monotonic()
+                session.nbytes = nbytes
+                over_budget = sum(s.nbytes for s in self._sessions.values()
+                                  if s.editor is not None) > self.memory_budget
+            if over_budget:
+                if self._thread is not None:
+                    self._wake.set()
+                else:
+                    self.trim()  # no sweeper (scripts) - trim on the caller's thread
+
+    def memory_bytes(self) -> int:
+        """RAM held by sessions that are currently in memory (as of their last request)"""
+        with self._lock:
+            return sum(s.nbytes for s in self._sessions.values() if s.editor is not None)
+
+    def trim(self):
+        """Spill idle sessions and, while over budget, least recently used ones; drop expired spills"""
+        now = time.monotonic()
+        with self._lock:
+            idle = sorted((s for s in self._sessions.values() if s.editor is not None and s.users == 0),
+                          key=lambda s: s.last_used)
+            total = sum(s.nbytes for s in self._sessions.values() if s.editor is not None)
+            victims = []
+            for session in idle:
+                if total > self.memory_budget or (
+                        self.idle_seconds is not None and now - session.last_used > self.idle_seconds):
+                    victims.append(session)
+                    total -= session.nbytes
+            expired = [s for s in self._sessions.values()
+                       if self.expire_seconds is not None and s.editor is None and s.users == 0
+                       and now - s.last_used > self.expire_seconds]
+            for session in expired:
+                del self._sessions[session.session_id]
+
+        for session in victims:
+            self._spill(session)
+        for session in expired:
+            self._discard(session)
+            self.stats['expired'] += 1
+
+    def _paths(self, session: _Session):
+        # Session ids come from the client - don't use them as file names directly
+        stem = hashlib.sha256(session.session_id.encode()).hexdigest()[:32]
+        return self.spill_dir / f"{stem}.json", self.spill_dir / f"{stem}.png"
+
+    def _spill(self, session: _Session):
+        with session.lock:
+            with self._lock:
+                # A request may have claimed it since trim() picked it
+                if session.users or session.editor is None:
+                    return
+                editor, session.editor = session.editor, None
+
+            try:
+                recipe_path, image_path = self._paths(session)
+                if editor.base_image is not None:
+                    # Fast, lossless compression - this runs on some other user's request
+                    editor.base_image.save(image_path, 'PNG', compress_level=1)
+                recipe_path.write_text(json.dumps(editor.session_recipe()))
+                editor.history.spill_all()
+            except Exception as e:
+                # Keep the session in memory rather than lose its work
+                print(f"✗ Could not spill session: {e}")
+                with self._lock:
+                    session.editor = editor
+                return
+
+            session.spilled = {'recipe': recipe_path,
+                               'image': image_path if editor.base_image is not None else None,
+                               'tiled_base': editor.tiled_base, 'history': editor.history}
+            session.nbytes = 0
+            self.stats['spilled'] += 1
+
+    def _rehydrate(self, session: _Session):
+        """Rebuild a spilled session's editor (session.lock held)"""
+        spilled = session.spilled
+        editor = self.factory(session.session_id)
+        base_image = None
+        if spilled['image'] is not None:
+            with Image.open(spilled['image']) as img:
+                base_image = img.convert('RGBA')
+        recipe = json.loads(spilled['recipe'].read_text())
+        editor.restore_session(recipe, base_image, spilled['tiled_base'], spilled['history'])
+
+        spilled['recipe'].unlink(missing_ok=True)
+        if spilled['image'] is not None:
+            spilled['image'].unlink(missing_ok=True)
+        session.spilled = None
+        self.stats['rehydrated'] += 1
+        return editor
+
+    def _discard(self, session: _Session):
+        with session.lock:
+            spilled, session.spilled = session.spilled, None
+        if spilled is None:
+            return
+        spilled['recipe'].unlink(missing_ok=True)
+        if spilled['image'] is not None:
+            spilled['image'].unlink(missing_ok=True)
+        spilled['history'].clear()
+        if spilled['tiled_base'] is not None:
+            spilled['tiled_base'].close()
+
+    def start(self, interval: float = 60.0):
+        """Spill idle, expired and over-budget sessions on a background thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval,), name="session-sweeper",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float):
+        # Every interval for idle/expired sessions, or right away when a request pushed us over budget
+        while True:
+            self._wake.wait(interval)
+            if self._stop.is_set():
+                break
+            self._wake.clear()
+            try:
+                self.trim()
+            except Exception as e:
+                print(f"✗ Session sweep failed: {e}")
+
+    def close(self):
+        """Stop the sweeper and delete every spilled session"""
+        self.stop()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
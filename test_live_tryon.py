@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import live_tryon
+from live_tryon import LiveTryOn, iter_video_frames
+
+
+class StubEditor:
+    """The parts of CatalogEditor that LiveTryOn uses, without Gradio"""
+
+    def __init__(self):
+        feature = np.zeros((20, 30, 4), dtype=np.uint8)
+        feature[:, :, 0] = 255
+        feature[:, :, 3] = np.linspace(0, 255, 30, dtype=np.uint8)  # opaque, transparent and edge pixels
+        self.feature_catalog = {'nose': {'Nose1': Image.fromarray(feature, 'RGBA')}}
+
+    def transform_feature(self, category, name, scale, rotation, opacity):
+        source = self.feature_catalog.get(category, {}).get(name)
+        if source is None:
+            return None
+        feature_img = source.resize((int(source.width * scale), int(source.height * scale)),
+                                    Image.Resampling.LANCZOS)
+        return feature_img.rotate(rotation, expand=True, resample=Image.Resampling.BICUBIC)
+
+    def _apply_overlay(self, base_img, overlay):
+        # Same as CatalogEditor._apply_overlay
+        feature_img = self.transform_feature(overlay['category'], overlay['name'], overlay['scale'],
+                                             overlay['rotation'], overlay['opacity'])
+        base_img.paste(feature_img, (overlay['x'] - feature_img.width // 2,
+                                     overlay['y'] - feature_img.height // 2), feature_img)
+        return base_img
+
+
+OVERLAYS = [
+    {'category': 'nose', 'name': 'Nose1', 'x': 40, 'y': 30, 'scale': 1.0, 'rotation': 0, 'opacity': 1.0},
+    {'category': 'nose', 'name': 'Nose1', 'x': 5, 'y': 50, 'scale': 1.5, 'rotation': 30, 'opacity': 1.0},
+]
+
+
+@pytest.fixture
+def gif_path(tmp_path):
+    rng = np.random.default_rng(0)
+    frames = [Image.fromarray(rng.integers(0, 256, (60, 80, 3), dtype=np.uint8)) for _ in range(5)]
+    path = tmp_path / "clip.gif"
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=40, loop=0)
+    return path
+
+
+def expected_frame(editor, frame, overlays):
+    result = Image.fromarray(frame).convert('RGBA')
+    for overlay in overlays:
+        editor._apply_overlay(result, overlay)
+    return np.asarray(result.convert('RGB'))
+
+
+def test_stream_video_matches_apply_overlay(gif_path):
+    editor = StubEditor()
+    tryon = LiveTryOn(editor, target_fps=0)  # no pacing
+    tryon.set_overlays(OVERLAYS)
+
+    frames = list(iter_video_frames(gif_path))
+    outputs = list(tryon.stream_video(gif_path))
+
+    assert len(outputs) == len(frames) == 5
+    assert (outputs[0] != frames[0]).any()
+    for frame, out in zip(frames, outputs):
+        np.testing.assert_array_equal(out, expected_frame(editor, frame, OVERLAYS))
+    assert tryon.stats['processed'] == 5
+    assert tryon.stats['dropped'] == 0
+
+
+def test_overlays_follow_reference_size(gif_path):
+    editor = StubEditor()
+    tryon = LiveTryOn(editor, target_fps=0)
+    tryon.set_overlays(OVERLAYS, reference_size=(160, 120))  # placed on a photo twice the frame width
+
+    frame = next(iter_video_frames(gif_path))
+    scaled = [dict(o, x=int(round(o['x'] * 0.5)), y=int(round(o['y'] * 0.5)), scale=o['scale'] * 0.5)
+              for o in OVERLAYS]
+    np.testing.assert_array_equal(tryon.process(frame), expected_frame(editor, frame, scaled))
+
+
+def test_process_drops_frames_above_target_fps(gif_path, monkeypatch):
+    clock = iter([100.0, 100.05, 100.15, 100.2, 100.3])
+    monkeypatch.setattr(live_tryon.time, 'perf_counter', lambda: next(clock))
+    editor = StubEditor()
+    tryon = LiveTryOn(editor, target_fps=10)
+    tryon.set_overlays(OVERLAYS)
+
+    frames = list(iter_video_frames(gif_path))
+    outputs = [tryon.process(frame) for frame in frames]
+
+    assert tryon.stats['processed'] == 3
+    assert tryon.stats['dropped'] == 2
+    # A dropped frame repeats the last composited one
+    assert outputs[1] is outputs[0]
+    assert outputs[3] is outputs[2]
+    np.testing.assert_array_equal(outputs[4], expected_frame(editor, frames[4], OVERLAYS))
@@ -0,0 +1,219 @@
+import os
+import struct
+import tempfile
+import weakref
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from compositing import OverlayPlan
+from image_ingest import EXIF_ORIENTATION
+
+DEFAULT_TILE_SIZE = 512
+
+
+class TiledImage:
+    """
+    An RGBA base image kept in a memory-mapped file instead of RAM.
+
+    The image is processed in bands of tile_size rows: overlays are only blended into the bands their
+    bounding box touches, and export streams bands straight to the encoder, so peak memory is a few
+    bands rather than the whole image.
+    """
+
+    def __init__(self, path: Path, size: Tuple[int, int], tile_size: int = DEFAULT_TILE_SIZE,
+                 delete_on_close: bool = True):
+        self.path = Path(path)
+        self.width, self.height = size
+        self.tile_size = tile_size
+        self.pixels = np.memmap(self.path, dtype=np.uint8, mode='r+', shape=(self.height, self.width, 4))
+        self._finalizer = weakref.finalize(self, _remove_file, self.path) if delete_on_close else None
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    @classmethod
+    def _allocate(cls, size: Tuple[int, int], tile_size: int, directory: Optional[Path]) -> 'TiledImage':
+        fd, path = tempfile.mkstemp(prefix="catalog_base_", suffix=".rgba", dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.truncate(size[0] * size[1] * 4)
+        return cls(Path(path), size, tile_size)
+
+    @classmethod
+    def from_file(cls, file_path, tile_size: int = DEFAULT_TILE_SIZE,
+                  directory: Optional[Path] = None) -> 'TiledImage':
+        """
+        Decode an image file (upright, per EXIF) into a memory-mapped RGBA file.
+
+        PIL decodes the whole frame in its own mode first (e.g. 3 bytes/pixel for RGB), so peak memory
+        at upload is one decoded frame; only the RGBA conversion and EXIF rotation are done a band at a
+        time, straight into the memory map.
+        """
+        with Image.open(file_path) as img:
+            img.load()
+            method = EXIF_TRANSPOSE_METHODS.get(img.getexif().get(EXIF_ORIENTATION, 1))
+            src_w, src_h = img.size
+            # Rotations by 90 degrees swap the output size
+            width, height = (src_h, src_w) if method in _SWAPS_AXES else (src_w, src_h)
+            tiled = cls._allocate((width, height), tile_size, directory)
+            for y0 in range(0, height, tile_size):
+                y1 = min(y0 + tile_size, height)
+                band = img.crop(_source_box(method, (src_w, src_h), y0, y1))
+                if method is not None:
+                    band = band.transpose(method)
+                tiled.pixels[y0:y1] = np.asarray(band.convert('RGBA'))
+        tiled.pixels.flush()
+        return tiled
+
+    def close(self):
+        """Release the memory map and delete its backing file"""
+        self.pixels = None
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def _overlay_layers(self, editor, overlays: List[Dict], ratio: float) -> List[Tuple]:
+        """Transform each overlay once for the full-resolution image: (pixels, center, bounding box)"""
+        layers = []
+        for overlay in overlays:
+            feature_img = editor.transform_feature(overlay['category'], overlay['name'],
+                                                   overlay['scale'] * ratio, overlay['rotation'],
+                                                   overlay['opacity'])
+            if feature_img is None:
+                continue
+            feature = np.asarray(feature_img.convert('RGBA'))
+            cx, cy = int(round(overlay['x'] * ratio)), int(round(overlay['y'] * ratio))
+            h, w = feature.shape[:2]
+            x0, y0 = cx - w // 2, cy - h // 2
+            layers.append((feature, (cx, cy), (x0, y0, x0 + w, y0 + h)))
+        return layers
+
+    def render_tile(self, box: Tuple[int, int, int, int], layers: List[Tuple]) -> np.ndarray:
+        """Composite the given overlay layers into a copy of one tile (x0, y0, x1, y1) of the base"""
+        x0, y0, x1, y1 = box
+        tile = np.array(self.pixels[y0:y1, x0:x1])
+        for feature, (cx, cy), (fx0, fy0, fx1, fy1) in layers:
+            # Only overlays whose bounding box touches this tile cost anything
+            if fx1 <= x0 or fx0 >= x1 or fy1 <= y0 or fy0 >= y1:
+                continue
+            OverlayPlan(feature, (cx - x0, cy - y0), (x1 - x0, y1 - y0)).blend_into(tile)
+        return tile
+
+    def iter_bands(self, editor, overlays: List[Dict], ratio: float = 1.0,
+                   band_height: Optional[int] = None) -> Iterator[np.ndarray]:
+        """Yield composited full-width bands from top to bottom"""
+        band_height = band_height or self.tile_size
+        layers = self._overlay_layers(editor, overlays, ratio)
+        for y0 in range(0, self.height, band_height):
+            yield self.render_tile((0, y0, self.width, min(y0 + band_height, self.height)), layers)
+
+    def preview(self, max_side: int, editor=None, overlays: Optional[List[Dict]] = None,
+                ratio: float = 1.0) -> Image.Image:
+        """Downscaled copy (box filter) built band by band; optionally with overlays composited"""
+        factor = max(1, -(-max(self.width, self.height) // max_side))
+        band_height = factor * max(1, self.tile_size // factor)
+
+        preview = Image.new('RGBA', (-(-self.width // factor), -(-self.height // factor)))
+        layers = self._overlay_layers(editor, overlays, ratio) if overlays else []
+        for y0 in range(0, self.height, band_height):
+            band = self.render_tile((0, y0, self.width, min(y0 + band_height, self.height)), layers)
+            preview.paste(Image.fromarray(band, 'RGBA').reduce(factor), (0, y0 // factor))
+        return preview
+
+    def to_image(self, editor, overlays: List[Dict], ratio: float = 1.0) -> Image.Image:
+        """Full composited image in RAM - only for encoders that can't be streamed"""
+        result = Image.new('RGBA', self.size)
+        y0 = 0
+        for band in self.iter_bands(editor, overlays, ratio):
+            result.paste(Image.fromarray(band, 'RGBA'), (0, y0))
+            y0 += band.shape[0]
+        return result
+
+    def export_png(self, save_path, editor, overlays: List[Dict], ratio: float = 1.0,
+                   compress_level: int = 6):
+        """Stream the composite to a PNG file one band at a time"""
+        with open(save_path, 'wb') as f:
+            write_png_stream(f, self.size, self.iter_bands(editor, overlays, ratio), compress_level)
+
+
+# EXIF orientation -> transpose that makes the image upright (as in ImageOps.exif_transpose)
+EXIF_TRANSPOSE_METHODS = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+_SWAPS_AXES = (Image.Transpose.TRANSPOSE, Image.Transpose.ROTATE_270, Image.Transpose.TRANSVERSE,
+               Image.Transpose.ROTATE_90)
+
+
+def _source_box(method, src_size: Tuple[int, int], y0: int, y1: int) -> Tuple[int, int, int, int]:
+    """Region of the stored image that becomes output rows y0:y1 after transposing with method"""
+    src_w, src_h = src_size
+    if method in (Image.Transpose.ROTATE_180, Image.Transpose.FLIP_TOP_BOTTOM):
+        return 0, src_h - y1, src_w, src_h - y0
+    if method in (Image.Transpose.TRANSPOSE, Image.Transpose.ROTATE_270):
+        return y0, 0, y1, src_h
+    if method in (Image.Transpose.TRANSVERSE, Image.Transpose.ROTATE_90):
+        return src_w - y1, 0, src_w - y0, src_h
+    return 0, y0, src_w, y1
+
+
+def _remove_file(path: Path):
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+
+def _png_chunk(f, chunk_type: bytes, data: bytes):
+    f.write(struct.pack(">I", len(data)))
+    f.write(chunk_type)
+    f.write(data)
+    f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type)) & 0xffffffff))
+
+
+def write_png_stream(f, size: Tuple[int, int], bands: Iterator[np.ndarray], compress_level: int = 6,
+                     idat_size: int = 1 << 20):
+    """
+    Write an 8-bit RGBA PNG from an iterator of (rows, width, 4) bands.
+
+    PIL needs the whole image to encode, so this writes the chunks itself with a streaming zlib
+    compressor; only one band plus one IDAT chunk are in memory at a time.
+    """
+    width, height = size
+    f.write(b"\x89PNG\r\n\x1a\n")
+    _png_chunk(f, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+
+    compressor = zlib.compressobj(compress_level)
+    pending = []
+    pending_bytes = 0
+    rows_written = 0
+
+    for band in bands:
+        # Every scanline starts with its filter type; 0 = None
+        scanlines = np.empty((band.shape[0], width * 4 + 1), dtype=np.uint8)
+        scanlines[:, 0] = 0
+        scanlines[:, 1:] = band.reshape(band.shape[0], -1)
+        rows_written += band.shape[0]
+
+        data = compressor.compress(scanlines.tobytes())
+        if data:
+            pending.append(data)
+            pending_bytes += len(data)
+        if pending_bytes >= idat_size:
+            _png_chunk(f, b"IDAT", b"".join(pending))
+            pending, pending_bytes = [], 0
+
+    if rows_written != height:
+        raise ValueError(f"PNG stream got {rows_written} rows, expected {height}")
+
+    pending.append(compressor.flush())
+    _png_chunk(f, b"IDAT", b"".join(pending))
+    _png_chunk(f, b"IEND", b"")